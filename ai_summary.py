@@ -0,0 +1,177 @@
+"""AI portfolio summaries: prompt built from an existing valuation, responses cached on disk.
+
+The cache key is a SHA-256 of the provider, model and normalized prompt, so re-running the
+report on an unchanged book never calls the API within AI_CACHE_TTL. Identical requests that are
+in flight at the same time share one call. AI_PROVIDER=stub swaps in a local, deterministic
+provider for offline tests and benchmarks (AI_STUB_LATENCY adds simulated latency in seconds).
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_imports import lazy_import
+
+AI_PROVIDER = os.getenv("AI_PROVIDER", "openai")
+AI_MODEL = os.getenv("AI_MODEL", "gpt-3.5-turbo")
+AI_CACHE_DIR = os.getenv("AI_CACHE_DIR", ".ai_cache")
+AI_CACHE_TTL = float(os.getenv("AI_CACHE_TTL", "3600"))
+AI_STUB_LATENCY = float(os.getenv("AI_STUB_LATENCY", "0"))
+SYSTEM_PROMPT = "You are a helpful investment advisor."
+
+openai = lazy_import("openai")
+dotenv = lazy_import("dotenv")
+
+
+# --- Prompt ---
+def build_prompt(valuation):
+    """Prompt from already computed positions (no price fetches), in a stable order."""
+    lines = ["Here's the user's portfolio:"]
+    for row in sorted(valuation.rows(), key=lambda r: r['symbol']):
+        current = f"${row['current']:.2f}" if row['current'] is not None else "unavailable"
+        lines.append(f"{row['symbol']}: {row['shares']} shares, bought at ${row['cost']:.2f}, current price {current}")
+    lines.append("")
+    lines.append(f"Total portfolio gain/loss: ${valuation.priced_gain:.2f}")
+    lines.append("Please write a concise summary of their portfolio performance and give 1 suggestion.")
+    return "\n".join(lines)
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip()
+
+def prompt_key(provider, prompt):
+    raw = json.dumps([provider.name, provider.model, SYSTEM_PROMPT, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# --- Providers ---
+class OpenAIProvider:
+    name = "openai"
+
+    def __init__(self, model=AI_MODEL):
+        self.model = model
+        self._client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                try:
+                    dotenv.load_dotenv()
+                except ImportError:
+                    pass
+                self._client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            return self._client
+
+    def complete(self, prompt, max_tokens=100):
+        response = self.client().chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+class StubProvider:
+    """Offline provider: a deterministic summary derived from the prompt itself."""
+    name = "stub"
+
+    def __init__(self, model="stub", latency=AI_STUB_LATENCY):
+        self.model = model
+        self.latency = latency
+        self.calls = 0
+
+    def complete(self, prompt, max_tokens=100):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        positions = re.findall(r"^(\S+): [\d.]+ shares", prompt, re.M)
+        total = re.search(r"Total portfolio gain/loss: \$(-?[\d.]+)", prompt)
+        gain = float(total.group(1)) if total else 0.0
+        verdict = "is up" if gain >= 0 else "is down"
+        return (f"Your portfolio of {len(positions)} position(s) ({', '.join(positions)}) {verdict} "
+                f"${abs(gain):.2f} overall. Suggestion: review your largest position's weight.")
+
+PROVIDERS = {"openai": OpenAIProvider, "stub": StubProvider}
+
+
+# --- Cache ---
+class SummaryCache:
+    def __init__(self, directory=AI_CACHE_DIR, ttl=AI_CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry['created'] > self.ttl:
+            return None
+        return entry['summary']
+
+    def put(self, key, summary):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(key) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({'created': time.time(), 'summary': summary}, f)
+        os.replace(tmp, self._path(key))
+
+
+# --- Summarizer ---
+class Summarizer:
+    def __init__(self, provider=None, cache=None, workers=2):
+        self.provider = provider or PROVIDERS[AI_PROVIDER]()
+        self.cache = cache or SummaryCache()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ai-summary")
+        self._in_flight = {}
+        self._lock = threading.RLock()  # done-callbacks may run while submit() holds it
+
+    def summarize_prompt(self, prompt):
+        """(summary, cached) for a prompt; errors propagate to the caller."""
+        key = prompt_key(self.provider, prompt)
+        summary = self.cache.get(key)
+        if summary is not None:
+            return summary, True
+        summary = self.provider.complete(prompt)
+        self.cache.put(key, summary)
+        return summary, False
+
+    def submit(self, valuation):
+        """Start summarizing in the background; concurrent identical prompts share one Future."""
+        prompt = build_prompt(valuation)
+        key = prompt_key(self.provider, prompt)
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._executor.submit(self.summarize_prompt, prompt)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+            return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def summarize(self, valuation):
+        return self.submit(valuation).result()
+
+
+_summarizer = None
+_summarizer_lock = threading.Lock()
+
+def get_summarizer():
+    global _summarizer
+    with _summarizer_lock:
+        if _summarizer is None:
+            _summarizer = Summarizer()
+        return _summarizer
@@ -0,0 +1,163 @@
+"""Non-interactive revaluation of every portfolio.
+
+    python batch_report.py [--users Alice,Bob] [--format jsonl|csv] [--output FILE] [--workers N]
+
+Users are streamed from storage twice: once to collect the distinct symbols across all books,
+whose quotes and 5-day histories are then fetched exactly once (one batched download each), and
+once to value every book in worker processes. Reports are written as they complete, so memory
+stays bounded by the number of in-flight books rather than the number of users. Progress and
+timings go to stderr. A book that fails to value is logged and skipped, and the exit status is then 1.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from quote_cache import quote_cache
+from history_store import calendar_days, history_store
+from storage import get_storage
+from valuation import value_portfolio
+
+FIELDS = [
+    "username", "positions", "total_invested", "total_current", "overall_gain",
+    "five_day_change", "top_mover", "top_gain", "bottom_mover", "bottom_gain", "unpriced",
+]
+
+
+# --- Valuation (runs in worker processes) ---
+def value_user(username, portfolio, prices, changes):
+    valuation = value_portfolio(portfolio, prices)
+    best, worst = valuation.top_movers(1), valuation.bottom_movers(1)
+    five_day = sum(stock['shares'] * changes.get(stock['symbol'], 0.0) for stock in portfolio)
+    return {
+        "username": username,
+        "positions": len(portfolio),
+        "total_invested": round(valuation.total_invested, 2),
+        "total_current": round(valuation.total_current, 2),
+        "overall_gain": round(valuation.overall_gain, 2),
+        "five_day_change": round(five_day, 2),
+        "top_mover": best[0]['symbol'] if best else None,
+        "top_gain": round(best[0]['gain'], 2) if best else None,
+        "bottom_mover": worst[0]['symbol'] if worst else None,
+        "bottom_gain": round(worst[0]['gain'], 2) if worst else None,
+        "unpriced": [stock['symbol'] for stock in portfolio if prices.get(stock['symbol']) is None],
+    }
+
+
+# --- Output ---
+class JsonlWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, report):
+        self.out.write(json.dumps(report) + "\n")
+
+class CsvWriter:
+    def __init__(self, out):
+        self.writer = csv.DictWriter(out, fieldnames=FIELDS)
+        self.writer.writeheader()
+
+    def write(self, report):
+        self.writer.writerow({**report, "unpriced": " ".join(report["unpriced"])})
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
+
+
+# --- Batch run ---
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+def selected(storage, users):
+    for username, portfolio in storage.iter_portfolios():
+        if users is None or username in users:
+            yield username, portfolio
+
+def run(writer, users=None, workers=None, storage=None, progress_every=1000):
+    storage = storage or get_storage()
+    timings = {}
+
+    start = time.perf_counter()
+    symbols = set()
+    count = 0
+    for _, portfolio in selected(storage, users):
+        symbols.update(stock['symbol'] for stock in portfolio)
+        count += 1
+    timings["scan"] = time.perf_counter() - start
+    log(f"📂 {count} portfolios, {len(symbols)} distinct symbols ({timings['scan']:.2f}s)")
+
+    start = time.perf_counter()
+    prices = quote_cache.get_many(symbols)
+    timings["quotes"] = time.perf_counter() - start
+    log(f"💲 {sum(p is not None for p in prices.values())}/{len(symbols)} quotes ({timings['quotes']:.2f}s)")
+
+    start = time.perf_counter()
+    history_store.refresh(symbols, calendar_days(5))
+    changes = {}
+    for symbol in symbols:
+        closes = history_store.recent_closes(symbol, 5)  # five trading sessions
+        if len(closes) >= 2:
+            changes[symbol] = float(closes[-1] - closes[0])
+    timings["history"] = time.perf_counter() - start
+    log(f"📈 5-day history for {len(changes)}/{len(symbols)} symbols ({timings['history']:.2f}s)")
+
+    start = time.perf_counter()
+    done = failed = 0
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}  # future -> username
+
+        def collect(future):
+            # One book failing to value is reported and skipped; the rest of the batch still runs
+            nonlocal done, failed
+            try:
+                writer.write(future.result())
+                done += 1
+            except Exception as e:
+                failed += 1
+                log(f"⚠️  {pending[future]}: {type(e).__name__}: {e}")
+            del pending[future]
+            if (done + failed) % progress_every == 0:
+                log(f"  … {done + failed}/{count} processed ({failed} failed)")
+
+        for username, portfolio in selected(storage, users):
+            held = {stock['symbol'] for stock in portfolio}
+            pending[pool.submit(
+                value_user, username, portfolio,
+                {s: prices.get(s) for s in held}, {s: changes[s] for s in held if s in changes})] = username
+            if len(pending) >= max_in_flight:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    collect(future)
+        for future in list(pending):
+            collect(future)
+    timings["valuation"] = time.perf_counter() - start
+    rate = done / timings["valuation"] if timings["valuation"] else 0
+    log(f"{'⚠️ ' if failed else '✅'} {done} portfolios valued, {failed} failed ({timings['valuation']:.2f}s, {rate:.0f}/s)")
+    return timings, failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Revalue every portfolio and stream the reports.")
+    parser.add_argument("--users", help="comma-separated usernames to include (default: all)")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    users = {u.strip() for u in args.users.split(",") if u.strip()} if args.users else None
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        timings, failed = run(WRITERS[args.format](out), users=users, workers=args.workers)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    log("⏱️  " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()) + f", total {sum(timings.values()):.2f}s")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
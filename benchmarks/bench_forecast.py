@@ -0,0 +1,84 @@
+"""Compare forecast backends on synthetic ~30-day histories.
+
+    python benchmarks/bench_forecast.py --symbols 20
+
+Each backend runs in a fresh interpreter so import time and peak RSS are measured separately.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def synthetic_histories(count, days=30, seed=7):
+    import random
+    rng = random.Random(seed)
+    histories = []
+    for i in range(count):
+        price = rng.uniform(20, 500)
+        prices = []
+        for _ in range(days):
+            price *= 1 + rng.gauss(0.0005, 0.015)
+            prices.append(round(price, 2))
+        histories.append((f"SYM{i}", prices))
+    return histories
+
+
+def run_backend(backend, count, workers):
+    os.environ["FORECAST_WORKERS"] = str(workers)
+    os.environ["FORECAST_CACHE_DIR"] = tempfile.mkdtemp()
+    start = time.perf_counter()
+    import forecasting
+    import_time = time.perf_counter() - start
+    items = synthetic_histories(count)
+    start = time.perf_counter()
+    results = dict(forecasting.forecast_many(items, 3, backend))
+    elapsed = time.perf_counter() - start
+    forecasting.get_engine().shutdown()
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "backend": backend,
+        "symbols": count,
+        "ok": sum(1 for r in results.values() if r is not None),
+        "import_s": import_time,
+        "forecast_s": elapsed,
+        "peak_rss_mb": rss_mb,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--backends", default="prophet,linear,ets")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_backend(args.child, args.symbols, args.workers)))
+        return
+
+    rows = []
+    for backend in args.backends.split(","):
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--symbols", str(args.symbols), "--workers", str(args.workers)],
+            capture_output=True, text=True, check=True,
+        )
+        rows.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print("| Backend | Symbols | Import (s) | Forecast (s) | Per symbol (ms) | Peak RSS (MB) |")
+    print("|---|---|---|---|---|---|")
+    for r in rows:
+        per_symbol = r["forecast_s"] / max(r["symbols"], 1) * 1000
+        print(f"| {r['backend']} | {r['ok']}/{r['symbols']} | {r['import_s']:.3f} | {r['forecast_s']:.3f} | {per_symbol:.2f} | {r['peak_rss_mb']:.0f} |")
+
+
+if __name__ == "__main__":
+    main()
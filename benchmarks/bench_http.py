@@ -0,0 +1,87 @@
+"""Fetch quotes and a year of closes from the local stand-in server: one fresh connection per
+symbol, one after another, vs. the pooled concurrent client (market_client.py).
+
+    python benchmarks/bench_http.py --symbols 50 --latency 0.05 --fail-rate 0.05
+
+The stand-in adds `--latency` seconds to every request and answers a `--fail-rate` share with 503,
+which the client retries; no network is used.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from market_client import MarketDataClient, _aiohttp, parse_chart  # noqa: E402
+from market_data import CHART_PATH, StandInServer  # noqa: E402
+
+
+def sequential(base_url, symbols, params, retries):
+    """One request per symbol on a new connection each, like per-ticker calls."""
+    result = {}
+    for symbol in symbols:
+        for attempt in range(retries + 1):
+            try:
+                with urllib.request.urlopen(f"{base_url}{CHART_PATH}{symbol}?interval=1d&{params}") as response:
+                    result[symbol] = parse_chart(json.load(response))
+                break
+            except urllib.error.HTTPError as e:
+                if e.code != 503 or attempt == retries:
+                    result[symbol] = None
+                    break
+    return result
+
+
+def run(symbols, latency, fail_rate, concurrency):
+    names = [f"SYM{i}" for i in range(symbols)]
+    start_day = datetime.date.today() - datetime.timedelta(days=365)
+    period1 = (start_day - datetime.date(1970, 1, 1)).days * 86400
+    _aiohttp()  # imported once per process; not part of a fetch
+    rows = []
+    for label in ("sequential", "pooled"):
+        server = StandInServer(latency=latency, fail_rate=fail_rate).start()
+        started = time.perf_counter()
+        if label == "sequential":
+            quotes = sequential(server.url, names, "range=5d", 3)
+            history = sequential(server.url, names, f"period1={period1}&period2={int(time.time())}", 3)
+        else:
+            client = MarketDataClient(server.url, concurrency=concurrency, backoff=0.01)
+            quotes = client.run(client.quotes(names))
+            history = client.run(client.history(names, start_day))
+            client.close()
+        elapsed = time.perf_counter() - started
+        stats = server.snapshot()
+        server.shutdown()
+        rows.append({
+            "mode": label,
+            "seconds": elapsed,
+            "ok": sum(1 for s in names if quotes.get(s) and history.get(s)),
+            **stats,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    rows = run(args.symbols, args.latency, args.fail_rate, args.concurrency)
+    print(f"{args.symbols} symbols, quotes + 1 year of closes, {args.latency * 1000:.0f} ms per request\n")
+    print("| Mode | Time (s) | OK | Requests | Connections | Max in flight |")
+    print("|---|---|---|---|---|---|")
+    for r in rows:
+        print(f"| {r['mode']} | {r['seconds']:.2f} | {r['ok']} | {r['requests']} | {r['connections']} | {r['max_in_flight']} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Import-time benchmark for the two entry points.
+
+    python benchmarks/bench_import.py            # check against benchmarks/import_budgets.json
+    python benchmarks/bench_import.py --update   # record the current timings as the new budgets
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`; the median
+cumulative import time over --runs is compared with its budget, and the run fails if a heavy
+dependency (which should only load on first use) shows up at import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGETS_FILE = os.path.join(ROOT, "benchmarks", "import_budgets.json")
+ENTRY_POINTS = ["portfolio_tracker", "web_portfolio"]
+LAZY_MODULES = ["numpy", "yfinance", "prophet", "pandas", "plotly", "openai"]
+HEADROOM = 1.5
+
+
+def import_profile(module):
+    """({module: cumulative microseconds}, stderr) for one cold import of `module`."""
+    env = dict(os.environ, FORECAST_PREWARM="0", PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module, runs):
+    samples = []
+    loaded = set()
+    for _ in range(runs):
+        times = import_profile(module)
+        samples.append(times[module] / 1000)
+        loaded |= {m.split(".")[0] for m in times}
+    return {
+        "median_ms": round(statistics.median(samples), 1),
+        "min_ms": round(min(samples), 1),
+        "eager_heavy": sorted(m for m in LAZY_MODULES if m in loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--update", action="store_true", help="record current timings as budgets")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.runs) for module in ENTRY_POINTS}
+    budgets = {}
+    if os.path.exists(BUDGETS_FILE):
+        with open(BUDGETS_FILE, "r") as f:
+            budgets = json.load(f)
+
+    if args.update:
+        budgets = {module: round(r["median_ms"] * HEADROOM, 1) for module, r in results.items()}
+        with open(BUDGETS_FILE, "w") as f:
+            json.dump(budgets, f, indent=4)
+            f.write("\n")
+
+    failed = False
+    for module, r in results.items():
+        budget = budgets.get(module)
+        r["budget_ms"] = budget
+        r["ok"] = not r["eager_heavy"] and (budget is None or r["median_ms"] <= budget)
+        failed |= not r["ok"]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for module, r in results.items():
+            status = "✅" if r["ok"] else "❌"
+            budget = f"{r['budget_ms']:.1f} ms" if r["budget_ms"] is not None else "none"
+            eager = f", eagerly imports {', '.join(r['eager_heavy'])}" if r["eager_heavy"] else ""
+            print(f"{status} {module}: median {r['median_ms']:.1f} ms (min {r['min_ms']:.1f} ms, budget {budget}){eager}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
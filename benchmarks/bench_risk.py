@@ -0,0 +1,63 @@
+"""Time the risk report on synthetic multi-year histories for many symbols.
+
+    python benchmarks/bench_risk.py --symbols 500 --years 5
+
+Histories are written to a temporary history store first, so the timing covers reading the
+memory-mapped columns, aligning them into one matrix and computing every metric (no network).
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history_store import HistoryStore, day_number  # noqa: E402
+from risk import risk_report  # noqa: E402
+
+
+def synthetic_fetcher(seed=7):
+    def fetch(symbols, start):
+        rng = np.random.default_rng(seed)
+        days = np.arange(day_number(start), day_number(datetime.date.today()) + 1)
+        days = days[(days + 3) % 7 < 5]  # weekdays only
+        market = rng.normal(0.0003, 0.01, len(days))
+        result = {}
+        for symbol in symbols:
+            returns = rng.uniform(0.5, 1.5) * market + rng.normal(0, 0.015, len(days))
+            prices = rng.uniform(20, 500) * np.cumprod(1 + returns)
+            result[symbol] = list(zip(days.tolist(), prices.tolist()))
+        return result
+    return fetch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    days = args.years * 365
+    store = HistoryStore(directory=tempfile.mkdtemp(), fetcher=synthetic_fetcher())
+    portfolio = [{'symbol': f"SYM{i}", 'shares': 10, 'cost_price': 100.0} for i in range(args.symbols)]
+    start = time.perf_counter()
+    risk_report(portfolio, days, benchmark="SYM0", store=store)
+    print(f"initial download + store write: {time.perf_counter() - start:.3f} s")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        report = risk_report(portfolio, days, benchmark="SYM0", store=store)
+        timings.append(time.perf_counter() - start)
+    print(f"risk report: {args.symbols} symbols x {report['observations']} days, "
+          f"median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms (min {min(timings) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Offline benchmark suite: valuation, forecasts, the portfolio page and JSON storage at several scales.
+
+    python benchmarks/bench_suite.py --output results.json       # run everything, save machine-readable results
+    python benchmarks/bench_suite.py --compare baseline.json     # ... and fail if a median got >25% slower
+    python benchmarks/bench_suite.py --max-scale 1000 --repeat 3 # quicker run
+
+Runs in a scratch directory (its own portfolios.json, history store and caches) with
+MARKET_DATA_PROVIDER=local (deterministic synthetic prices, or a recording via --market-data),
+AI_PROVIDER=stub and the linear forecaster, so nothing touches the network and runs on
+different commits see the same inputs. Each case runs once cold, then --repeat times; results
+record the cold time, median, min and max with the commit and Python version.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def configure(workdir, market_data=None):
+    """Environment for an offline run; must happen before the project modules are imported."""
+    os.environ.update({
+        "MARKET_DATA_PROVIDER": "local",
+        "MARKET_DATA_FILE": os.path.abspath(market_data) if market_data else os.path.join(workdir, "market_data.json"),
+        "HISTORY_DIR": os.path.join(workdir, ".history"),
+        "FORECAST_CACHE_DIR": os.path.join(workdir, ".forecast_cache"),
+        "AI_CACHE_DIR": os.path.join(workdir, ".ai_cache"),
+        "AI_PROVIDER": "stub",
+        "FORECAST_BACKEND": "linear",
+        "FORECAST_WORKERS": "1",
+        "FORECAST_PREWARM": "0",
+        "PORTFOLIO_STORAGE": "json",
+    })
+    # The 1k-holding cases need every price cached at once (the default keeps 512)
+    os.environ.setdefault("QUOTE_CACHE_MAXSIZE", "4096")
+    os.chdir(workdir)
+
+
+def holdings(count, seed=0):
+    rng = random.Random(seed)
+    return [{'symbol': f"SYM{i}", 'shares': rng.randint(1, 500), 'cost_price': round(rng.uniform(10, 500), 2)}
+            for i in range(count)]
+
+
+# --- Cases: each takes a scale and returns a zero-argument callable to time ---
+def case_calculate_portfolio_value(scale):
+    import portfolio_tracker
+    portfolio = holdings(scale)
+    return lambda: portfolio_tracker.calculate_portfolio_value(portfolio)
+
+def case_predict_portfolio_returns(scale):
+    import portfolio_tracker
+    portfolio = holdings(scale)
+    return lambda: portfolio_tracker.predict_portfolio_returns(portfolio)
+
+def case_portfolio_view(scale):
+    import web_portfolio
+    from storage import get_storage
+    username = f"Bench{scale}"
+    get_storage().save_portfolio(username, holdings(scale))
+    client = web_portfolio.app.test_client()
+
+    def run():
+        response = client.get(f"/portfolio/{username}")
+        assert response.status_code == 200, response.status_code
+    return run
+
+def case_portfolio_view_not_modified(scale):
+    import web_portfolio
+    from storage import get_storage
+    username = f"Bench{scale}"
+    get_storage().save_portfolio(username, holdings(scale))
+    client = web_portfolio.app.test_client()
+    etag = client.get(f"/portfolio/{username}").headers.get("ETag")
+
+    def run():
+        response = client.get(f"/portfolio/{username}", headers={"If-None-Match": etag})
+        assert response.status_code == 304, response.status_code
+    return run
+
+def _portfolios(scale, per_user=100):
+    books = {}
+    for start in range(0, scale, per_user):
+        books[f"User{start // per_user}"] = holdings(min(per_user, scale - start), seed=start)
+    return books
+
+def case_json_save(scale):
+    import portfolio_tracker
+    data = _portfolios(scale)
+    return lambda: portfolio_tracker.save_all_portfolios(data)
+
+def case_json_load(scale):
+    import portfolio_tracker
+    portfolio_tracker.save_all_portfolios(_portfolios(scale))
+    return portfolio_tracker.load_all_portfolios
+
+CASES = [
+    ("calculate_portfolio_value", case_calculate_portfolio_value, (10, 1000)),
+    ("predict_portfolio_returns", case_predict_portfolio_returns, (10, 100)),
+    ("portfolio_view", case_portfolio_view, (10, 1000)),
+    ("portfolio_view_304", case_portfolio_view_not_modified, (10, 1000)),
+    ("json_save", case_json_save, (10, 1000, 100000)),
+    ("json_load", case_json_load, (10, 1000, 100000)),
+]
+
+
+# --- Running and comparing ---
+def measure(run, repeat):
+    with contextlib.redirect_stdout(io.StringIO()):  # the console functions print their reports
+        start = time.perf_counter()
+        run()
+        first = time.perf_counter() - start
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+    return {"first_s": first, "median_s": statistics.median(times), "min_s": min(times), "max_s": max(times), "runs": repeat}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold, min_delta=0.001):
+    """Markdown table of median ratios against `baseline`; returns the cases slower than 1 + threshold.
+
+    Differences under `min_delta` seconds are ignored: sub-millisecond cases are mostly timer noise.
+    """
+    before = {(r["name"], r["scale"]): r for r in baseline["results"]}
+    print("| Case | Scale | Baseline (s) | Now (s) | Ratio |", file=sys.stderr)
+    print("|---|---|---|---|---|", file=sys.stderr)
+    slower = []
+    for result in results:
+        old = before.get((result["name"], result["scale"]))
+        if old is None or not old["median_s"]:
+            continue
+        ratio = result["median_s"] / old["median_s"]
+        regressed = ratio > 1 + threshold and result["median_s"] - old["median_s"] > min_delta
+        flag = " ⚠️" if regressed else ""
+        print(f"| {result['name']} | {result['scale']} | {old['median_s']:.4f} | {result['median_s']:.4f} | {ratio:.2f}{flag} |", file=sys.stderr)
+        if flag:
+            slower.append(result)
+    return slower
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-scale", type=int, default=None, help="skip larger scales")
+    parser.add_argument("--cases", help="comma-separated case names (default: all)")
+    parser.add_argument("--market-data", help="recording to replay (see market_data.py record)")
+    parser.add_argument("--output", default="-", help="results JSON (default: stdout)")
+    parser.add_argument("--compare", help="baseline results JSON to compare medians against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before --compare fails")
+    parser.add_argument("--min-delta", type=float, default=0.001, help="ignore slowdowns smaller than this many seconds")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+    output = os.path.abspath(args.output) if args.output != "-" else None
+    selected = set(args.cases.split(",")) if args.cases else None
+
+    with tempfile.TemporaryDirectory(prefix="portfolio-bench-") as workdir:
+        configure(workdir, args.market_data)
+        results = []
+        for name, case, scales in CASES:
+            if selected is not None and name not in selected:
+                continue
+            for scale in scales:
+                if args.max_scale is not None and scale > args.max_scale:
+                    continue
+                result = {"name": name, "scale": scale, **measure(case(scale), args.repeat)}
+                print(f"{name} @ {scale}: median {result['median_s'] * 1000:.1f} ms (cold {result['first_s'] * 1000:.1f} ms)", file=sys.stderr)
+                results.append(result)
+        os.chdir(ROOT)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if baseline is not None and compare(results, baseline, args.threshold, args.min_delta):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Streaming export and bulk import of holdings, transactions and valuations.
+
+    python bulk_io.py export holdings|transactions|valuations [--user NAME] [--format csv|jsonl|parquet] [--output FILE]
+    python bulk_io.py import FILE [--user NAME] [--format csv|jsonl|parquet] [--batch-size N]
+
+Exports stream rows from the storage backend (SQLite off a cursor, the journal line by line; the
+JSON backend has to load its files) and encode them EXPORT_CHUNK_ROWS at a time, so memory stays
+flat however many rows there are. The web app serves the same streams from
+/portfolio/<user>/export/<dataset>.<format>. Valuations fetch every distinct symbol's quote once.
+
+Imports read broker trade files (one buy or sell per row; common column names such as Date, Side,
+Ticker, Quantity are recognized) in batches of IMPORT_BATCH_SIZE rows. Each batch is applied in
+one storage write with the same average-cost rule as the buy/sell paths; rows that cannot be
+applied (unknown action, bad number, selling more than held) are skipped and reported. Progress and
+rows per second go to stderr.
+"""
+import argparse
+import csv
+import datetime
+import functools
+import io
+import json
+import os
+import sys
+import time
+
+from quote_cache import quote_cache
+from storage import get_storage
+from valuation import value_portfolio
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "10000"))
+MAX_REPORTED_ERRORS = 20
+
+DATASETS = {
+    "holdings": [("username", "string"), ("symbol", "string"), ("shares", "int64"), ("cost_price", "float64")],
+    "transactions": [("username", "string"), ("datetime", "string"), ("action", "string"), ("symbol", "string"),
+                     ("shares", "int64"), ("price", "float64")],
+    "valuations": [("username", "string"), ("symbol", "string"), ("shares", "int64"), ("cost_price", "float64"),
+                   ("current_price", "float64"), ("invested", "float64"), ("current_value", "float64"),
+                   ("gain", "float64"), ("weight", "float64")],
+}
+MIMETYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet needs pyarrow (pip install pyarrow)") from None
+    return pyarrow, pyarrow.parquet
+
+
+# --- Rows ---
+def _portfolios(storage, username=None):
+    if username is not None:
+        return [(username, storage.get_portfolio(username))]
+    return storage.iter_portfolios()
+
+def holding_rows(storage, username=None):
+    for user, portfolio in _portfolios(storage, username):
+        for stock in portfolio:
+            yield {'username': user, 'symbol': stock['symbol'], 'shares': stock['shares'], 'cost_price': stock['cost_price']}
+
+def transaction_rows(storage, username=None):
+    for user, tx in storage.iter_transactions(username):
+        yield {'username': user, 'datetime': tx['datetime'], 'action': tx['action'], 'symbol': tx['symbol'],
+               'shares': tx['shares'], 'price': tx['price']}
+
+def valuation_rows(storage, username=None, quotes=quote_cache):
+    # One pass to collect the symbols, so their quotes come in one batched download, then one to value
+    symbols = {row['symbol'] for row in holding_rows(storage, username)}
+    prices = quotes.get_many(symbols)
+    for user, portfolio in _portfolios(storage, username):
+        for row in value_portfolio(portfolio, prices).rows():
+            yield {'username': user, 'symbol': row['symbol'], 'shares': row['shares'], 'cost_price': row['cost'],
+                   'current_price': row['current'], 'invested': row['invested'],
+                   'current_value': row['current_value'], 'gain': row['gain'], 'weight': row['weight']}
+
+ROWS = {"holdings": holding_rows, "transactions": transaction_rows, "valuations": valuation_rows}
+
+
+# --- Encoders: write() takes a list of rows, output goes to a binary file object ---
+class JsonlEncoder:
+    def __init__(self, out, fields):
+        self.out = out
+
+    def write(self, rows):
+        self.out.write("".join(json.dumps(row) + "\n" for row in rows).encode())
+
+    def close(self):
+        pass
+
+class CsvEncoder:
+    def __init__(self, out, fields):
+        self.out = out
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(self.buffer, fieldnames=[name for name, _ in fields])
+        self.writer.writeheader()
+        self._flush()
+
+    def _flush(self):
+        self.out.write(self.buffer.getvalue().encode())
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self._flush()
+
+    def close(self):
+        pass
+
+class ParquetEncoder:
+    """One row group per chunk of rows, with a fixed schema so chunks with all-null columns still match."""
+
+    def __init__(self, out, fields):
+        pa, pq = _pyarrow()
+        self.schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in fields])
+        self.table = pa.Table
+        self.writer = pq.ParquetWriter(out, self.schema)
+
+    def write(self, rows):
+        self.writer.write_table(self.table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+ENCODERS = {"csv": CsvEncoder, "jsonl": JsonlEncoder, "parquet": ParquetEncoder}
+
+
+class _Sink:
+    """Write-only file object whose contents are handed out, and dropped, chunk by chunk."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+# --- Export ---
+class Export:
+    """Iterable of encoded byte chunks for one dataset; `rows` counts what has been written so far."""
+
+    def __init__(self, dataset, format="csv", username=None, storage=None, chunk_rows=EXPORT_CHUNK_ROWS):
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset '{dataset}' (choose from {', '.join(DATASETS)})")
+        if format not in ENCODERS:
+            raise ValueError(f"Unknown format '{format}' (choose from {', '.join(ENCODERS)})")
+        if format == "parquet":
+            _pyarrow()  # fail before the first byte is sent, not halfway through a response
+        self.dataset, self.format, self.username = dataset, format, username
+        self.storage = storage or get_storage()
+        self.chunk_rows = chunk_rows
+        self.mimetype = MIMETYPES[format]
+        self.rows = 0
+
+    def __iter__(self):
+        sink = _Sink()
+        encoder = ENCODERS[self.format](sink, DATASETS[self.dataset])
+        chunk = []
+        for row in ROWS[self.dataset](self.storage, self.username):
+            chunk.append(row)
+            if len(chunk) >= self.chunk_rows:
+                encoder.write(chunk)
+                self.rows += len(chunk)
+                chunk = []
+                yield sink.drain()
+        if chunk:
+            encoder.write(chunk)
+            self.rows += len(chunk)
+        encoder.close()
+        yield sink.drain()
+
+
+# --- Import ---
+COLUMNS = {
+    "username": "username", "user": "username",
+    "datetime": "datetime", "date": "datetime", "trade date": "datetime", "timestamp": "datetime",
+    "action": "action", "side": "action", "type": "action", "transaction type": "action",
+    "symbol": "symbol", "ticker": "symbol",
+    "shares": "shares", "quantity": "shares", "qty": "shares",
+    "price": "price", "trade price": "price", "cost_price": "price",
+}
+ACTIONS = {"buy": "buy", "bought": "buy", "b": "buy", "sell": "sell", "sold": "sell", "s": "sell"}
+DATE_FORMATS = ("%m/%d/%Y %H:%M:%S", "%m/%d/%Y", "%d-%b-%Y")
+
+def read_records(path, format):
+    """Yield (line or row number, {column: value}) from a CSV, JSONL or Parquet trade file."""
+    if format == "csv":
+        with open(path, "r", newline="") as f:
+            reader = csv.DictReader(f)
+            for record in reader:
+                yield reader.line_num, record
+    elif format == "jsonl":
+        with open(path, "r") as f:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+    elif format == "parquet":
+        _, pq = _pyarrow()
+        number = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=IMPORT_BATCH_SIZE):
+            for record in batch.to_pylist():
+                number += 1
+                yield number, record
+    else:
+        raise ValueError(f"Unknown format '{format}' (choose from {', '.join(ENCODERS)})")
+
+def _number(value, what):
+    try:
+        return float(str(value).replace("$", "").replace(",", "").strip())
+    except ValueError:
+        raise ValueError(f"invalid {what} {value!r}") from None
+
+@functools.lru_cache(maxsize=4096)
+def _field(column):
+    return COLUMNS.get(str(column).strip().lower())
+
+@functools.lru_cache(maxsize=4096)  # trade files repeat the same few dates on many rows
+def _parse_datetime(value):
+    value = value.strip()
+    if not value:
+        raise ValueError("missing date")
+    try:
+        when = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in DATE_FORMATS:
+            try:
+                when = datetime.datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"invalid date {value!r}") from None
+    return when.strftime('%Y-%m-%d %H:%M:%S')
+
+def parse_datetime(value):
+    """Broker date/time in the app's 'YYYY-MM-DD HH:MM:SS' format (so transactions sort by it)."""
+    return _parse_datetime(str(value or ""))
+
+def parse_trade(record, username=None):
+    """Trade dict for storage.record_trades from one broker row; raises ValueError when unusable."""
+    row = {}
+    for column, value in record.items():
+        field = _field(column)
+        if field is not None and field not in row:
+            row[field] = value
+    user = str(row.get('username') or username or "").strip()
+    if not user:
+        raise ValueError("no username (add a username column or pass --user)")
+    action = ACTIONS.get(str(row.get('action') or "").strip().lower())
+    if action is None:
+        raise ValueError(f"unknown action {row.get('action')!r}")
+    symbol = str(row.get('symbol') or "").strip().upper()
+    if not symbol:
+        raise ValueError("missing symbol")
+    shares = abs(_number(row.get('shares'), "quantity"))  # some brokers report sells as negative quantities
+    if shares == 0 or not shares.is_integer():
+        raise ValueError(f"quantity must be a whole number of shares, got {row.get('shares')!r}")
+    price = _number(row.get('price'), "price")
+    if price < 0:
+        raise ValueError(f"negative price {row.get('price')!r}")
+    return {'username': user, 'action': action, 'symbol': symbol, 'shares': int(shares), 'price': price,
+            'datetime': parse_datetime(row.get('datetime'))}
+
+def import_trades(path, format=None, username=None, storage=None, batch_size=IMPORT_BATCH_SIZE):
+    """Apply every trade in `path` in batches; returns counts, timing and the first few errors."""
+    storage = storage or get_storage()
+    format = format or os.path.splitext(path)[1].lstrip(".").lower()
+    stats = {'rows': 0, 'imported': 0, 'rejected': 0, 'errors': []}
+    started = time.perf_counter()
+
+    def reject(line, message):
+        stats['rejected'] += 1
+        if len(stats['errors']) < MAX_REPORTED_ERRORS:
+            stats['errors'].append(f"row {line}: {message}")
+
+    def flush(batch, lines):
+        rejected = storage.record_trades(batch)
+        for i, message in rejected:
+            reject(lines[i], message)
+        stats['imported'] += len(batch) - len(rejected)
+        elapsed = time.perf_counter() - started
+        log(f"  … {stats['rows']} rows ({stats['rows'] / elapsed:,.0f} rows/s)")
+
+    batch, lines = [], []
+    for line, record in read_records(path, format):
+        stats['rows'] += 1
+        try:
+            trade = parse_trade(record, username)
+        except (TypeError, ValueError) as e:
+            reject(line, str(e))
+            continue
+        batch.append(trade)
+        lines.append(line)
+        if len(batch) >= batch_size:
+            flush(batch, lines)
+            batch, lines = [], []
+    if batch:
+        flush(batch, lines)
+    stats['seconds'] = time.perf_counter() - started
+    stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+    return stats
+
+
+# --- CLI ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream exports of, or bulk-import trades into, portfolio storage.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="write holdings, transactions or valuations")
+    export.add_argument("dataset", choices=sorted(DATASETS))
+    export.add_argument("--user", help="only this user (default: all users)")
+    export.add_argument("--format", choices=sorted(ENCODERS), default="csv")
+    export.add_argument("--output", default="-", help="output file (default: stdout)")
+    export.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS)
+    imports = commands.add_parser("import", help="apply a broker trade file")
+    imports.add_argument("file")
+    imports.add_argument("--user", help="username for rows without a username column")
+    imports.add_argument("--format", choices=sorted(ENCODERS), help="default: from the file extension")
+    imports.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        started = time.perf_counter()
+        job = Export(args.dataset, args.format, args.user, chunk_rows=args.chunk_rows)
+        out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            for data in job:
+                out.write(data)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        elapsed = time.perf_counter() - started
+        log(f"✅ Exported {job.rows} {args.dataset} rows ({elapsed:.2f}s, {job.rows / elapsed if elapsed else 0:,.0f} rows/s)")
+    else:
+        stats = import_trades(args.file, args.format, args.user, batch_size=args.batch_size)
+        for error in stats['errors']:
+            log(f"⚠️  {error}")
+        log(f"✅ Imported {stats['imported']}/{stats['rows']} rows, {stats['rejected']} rejected "
+            f"({stats['seconds']:.2f}s, {stats['rows_per_second']:,.0f} rows/s)")
+        sys.exit(1 if stats['rejected'] else 0)
+
+
+if __name__ == "__main__":
+    main()
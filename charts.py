@@ -0,0 +1,59 @@
+import os
+
+MAX_CHART_POINTS = int(os.getenv("MAX_CHART_POINTS", "300"))
+
+
+# --- Downsampling ---
+def downsample(xs, ys, max_points=MAX_CHART_POINTS):
+    """Largest-Triangle-Three-Buckets: keep the points that preserve the visual shape of the line."""
+    n = len(ys)
+    if max_points < 3 or n <= max_points:
+        return list(xs), list(ys)
+    bucket = (n - 2) / (max_points - 2)
+    out_x, out_y = [xs[0]], [ys[0]]
+    a = 0
+    for i in range(max_points - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        # Average of the next bucket is the third corner of the triangle
+        next_start, next_end = end, min(int((i + 2) * bucket) + 1, n)
+        if next_start >= next_end:
+            next_start, next_end = n - 1, n
+        avg_x = (next_start + next_end - 1) / 2
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((a - avg_x) * (ys[j] - ys[a]) - (a - j) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
+
+# --- Figures ---
+def _trace(name, xs, ys, mode, max_points):
+    xs, ys = downsample(xs, ys, max_points)
+    return {'type': 'scatter', 'name': name, 'mode': mode, 'x': xs, 'y': [round(y, 4) for y in ys]}
+
+def price_forecast_figure(symbol, history, forecast, max_points=MAX_CHART_POINTS):
+    """Compact Plotly figure spec (history + forecast) to be drawn client-side with Plotly.newPlot."""
+    dates = forecast['dates']
+    axis = {'gridcolor': '#ebf0f8', 'zerolinecolor': '#ebf0f8'}
+    return {
+        'data': [
+            _trace('History', dates[:len(history)], history, 'lines+markers', max_points),
+            _trace('Forecast', dates, forecast['yhat'], 'lines', max_points),
+        ],
+        'layout': {
+            'title': {'text': f"{symbol} Price Prediction (History + 3d Forecast)"},
+            'xaxis': {'title': {'text': 'Date'}, **axis},
+            'yaxis': {'title': {'text': 'Price ($)'}, **axis},
+            'plot_bgcolor': 'white',
+            'paper_bgcolor': 'white',
+            'height': 350,
+        },
+    }
@@ -0,0 +1,408 @@
+import datetime
+import hashlib
+import importlib
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+FORECAST_CACHE_DIR = os.getenv("FORECAST_CACHE_DIR", ".forecast_cache")
+FORECAST_MEMO_SIZE = int(os.getenv("FORECAST_MEMO_SIZE", "256"))
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", str(os.cpu_count() or 1)))
+FORECAST_TIMEOUT = float(os.getenv("FORECAST_TIMEOUT", "120"))
+FORECAST_BACKEND = os.getenv("FORECAST_BACKEND", "prophet")
+FORECAST_PREWARM = os.getenv("FORECAST_PREWARM", "1") == "1"
+MIN_HISTORY = 10
+
+_models = OrderedDict()  # (symbol, fingerprint) -> fitted Prophet model
+_models_lock = threading.Lock()
+CACHE_ENTRY_TTL = 86400  # fingerprints include the date, so older model files are never read again
+CACHE_PRUNE_INTERVAL = 3600
+_last_prune = 0.0
+
+
+# --- Model memoization ---
+def history_fingerprint(prices):
+    """Fingerprint of a price history; includes today's date since the fit is anchored on it."""
+    digest = hashlib.sha1()
+    digest.update(datetime.date.today().isoformat().encode())
+    for p in prices:
+        digest.update(f"{float(p):.6f},".encode())
+    return digest.hexdigest()[:16]
+
+def _model_path(symbol, fingerprint):
+    return os.path.join(FORECAST_CACHE_DIR, f"{symbol}_{fingerprint}.json")
+
+def _load_model(symbol, fingerprint):
+    key = (symbol, fingerprint)
+    with _models_lock:
+        if key in _models:
+            _models.move_to_end(key)
+            return _models[key]
+    if symbol is None:
+        return None
+    path = _model_path(symbol, fingerprint)
+    if not os.path.exists(path):
+        return None
+    try:
+        from prophet.serialize import model_from_json
+        with open(path, "r") as f:
+            model = model_from_json(f.read())
+    except Exception:
+        return None
+    _remember_model(key, model)
+    return model
+
+def _remember_model(key, model):
+    with _models_lock:
+        _models[key] = model
+        _models.move_to_end(key)
+        while len(_models) > FORECAST_MEMO_SIZE:
+            _models.popitem(last=False)
+
+def _save_model(symbol, fingerprint, model):
+    _remember_model((symbol, fingerprint), model)
+    if symbol is None:
+        return
+    try:
+        from prophet.serialize import model_to_json
+        os.makedirs(FORECAST_CACHE_DIR, exist_ok=True)
+        with open(_model_path(symbol, fingerprint), "w") as f:
+            f.write(model_to_json(model))
+    except Exception:
+        pass
+    _prune_models()
+
+def _prune_models(now=None):
+    """Delete model files older than CACHE_ENTRY_TTL (at most one directory scan per CACHE_PRUNE_INTERVAL)."""
+    global _last_prune
+    now = time.time() if now is None else now
+    with _models_lock:
+        if now - _last_prune < CACHE_PRUNE_INTERVAL:
+            return
+        _last_prune = now
+    try:
+        entries = list(os.scandir(FORECAST_CACHE_DIR))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.name.endswith(".json") and now - entry.stat().st_mtime > CACHE_ENTRY_TTL:
+                os.remove(entry.path)
+        except OSError:
+            pass  # removed by another worker meanwhile
+
+
+# --- Fitting & forecasting ---
+def fit_model(symbol, prices):
+    """Return a fitted Prophet model for the history, reusing a memoized fit when possible."""
+    if not prices or len(prices) < MIN_HISTORY:
+        raise ValueError("Not enough historical data to predict (need at least 10 days).")
+    fingerprint = history_fingerprint(prices)
+    model = _load_model(symbol, fingerprint)
+    if model is not None:
+        return model
+    from prophet import Prophet
+    import pandas as pd
+    df = pd.DataFrame({
+        'ds': pd.date_range(end=pd.Timestamp.today(), periods=len(prices)),
+        'y': prices
+    })
+    model = Prophet(daily_seasonality=False, yearly_seasonality=False, weekly_seasonality=False)
+    model.fit(df)
+    _save_model(symbol, fingerprint, model)
+    return model
+
+def forecast_frame(symbol, prices, periods):
+    """Fit once and return Prophet's forecast frame covering the history plus `periods` days."""
+    model = fit_model(symbol, prices)
+    future = model.make_future_dataframe(periods=periods, freq='D')
+    return model.predict(future)
+
+def forecast_path(symbol, prices, periods):
+    """Plain (picklable) forecast: ISO dates and yhat for the history plus `periods` days."""
+    forecast = forecast_frame(symbol, prices, periods)
+    return {
+        'dates': [d.strftime('%Y-%m-%d') for d in forecast['ds']],
+        'yhat': [float(y) for y in forecast['yhat']],
+    }
+
+def horizon_prices(path, history_len, horizons):
+    return {h: path['yhat'][history_len + h - 1] for h in horizons}
+
+def forecast_horizons(symbol, prices, horizons, backend=None):
+    """Predicted price for every horizon (in days) from a single fit of the longest one."""
+    horizons = list(horizons)
+    if not prices or len(prices) < MIN_HISTORY:
+        raise ValueError("Not enough historical data to predict (need at least 10 days).")
+    path = get_forecaster(backend).forecast_one(symbol, prices, max(horizons))
+    return horizon_prices(path, len(prices), horizons)
+
+def predict_future_price(prices, periods, symbol=None, backend=None):
+    return forecast_horizons(symbol, prices, [periods], backend)[periods]
+
+def forecast_many(items, periods, backend=None):
+    """Yield (symbol, path or None) for (symbol, prices) items using the selected backend."""
+    return get_forecaster(backend).forecast_many(items, periods)
+
+
+# --- Parallel engine ---
+class ForecastTimeout(Exception):
+    pass
+
+def _on_alarm(signum, frame):
+    raise ForecastTimeout("Forecast timed out")
+
+def _forecast_task(symbol, prices, periods, timeout):
+    # Runs in a worker process, where tasks execute on the main thread so SIGALRM is usable
+    use_alarm = timeout and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.alarm(max(1, int(timeout)))
+    try:
+        return forecast_path(symbol, prices, periods)
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+
+class ForecastEngine:
+    """Runs per-symbol fits in a process pool and yields results as they finish."""
+
+    def __init__(self, workers=FORECAST_WORKERS, timeout=FORECAST_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _reset(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def forecast_many(self, items, periods):
+        """Yield (symbol, path) for each (symbol, prices) item; path is None if the fit failed."""
+        items = [(symbol, prices) for symbol, prices in items if prices and len(prices) >= MIN_HISTORY]
+        if not items:
+            return
+        if self.workers <= 1:
+            for symbol, prices in items:
+                try:
+                    yield symbol, forecast_path(symbol, prices, periods)
+                except Exception:
+                    yield symbol, None
+            return
+        try:
+            pool = self._executor()
+            futures = {
+                pool.submit(_forecast_task, symbol, prices, periods, self.timeout): symbol
+                for symbol, prices in items
+            }
+        except BrokenProcessPool:
+            self._reset()
+            for symbol, _ in items:
+                yield symbol, None
+            return
+        # Safety net on top of the in-worker alarm: every task gets `timeout` once a worker picks it up
+        rounds = -(-len(futures) // self.workers)
+        pending = set(futures.values())
+        try:
+            for future in as_completed(futures, timeout=self.timeout * rounds + 5):
+                symbol = futures[future]
+                pending.discard(symbol)
+                try:
+                    yield symbol, future.result()
+                except BrokenProcessPool:
+                    self._reset()
+                    yield symbol, None
+                except Exception:
+                    yield symbol, None
+        except TimeoutError:
+            for future in futures:
+                future.cancel()
+            for symbol in pending:
+                yield symbol, None
+
+    def prewarm(self):
+        """Start the worker processes and import Prophet in each of them."""
+        if self.workers <= 1:
+            return
+        pool = self._executor()
+        for future in [pool.submit(_warm_worker) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        self._reset()
+
+
+def _import_prophet():
+    # pulls in pandas and cmdstanpy as well
+    return importlib.import_module("prophet")
+
+def _warm_worker():
+    _import_prophet()
+    return True  # a module can't be pickled back to the parent
+
+def prewarm(backend=None):
+    """Import Prophet (here and in the pool workers) in a background thread, so the first fit doesn't pay for it."""
+    if get_forecaster(backend).name != "prophet":
+        return None
+    def warm():
+        try:
+            _import_prophet()
+            get_engine().prewarm()
+        except Exception:
+            pass
+    thread = threading.Thread(target=warm, name="prophet-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = ForecastEngine()
+    return _engine
+
+
+# --- Backends ---
+def _path_dates(history_len, periods):
+    end = datetime.date.today()
+    start = end - datetime.timedelta(days=history_len - 1)
+    return [(start + datetime.timedelta(days=i)).isoformat() for i in range(history_len + periods)]
+
+class Forecaster:
+    """Forecast backend; `forecast_many` yields (symbol, {'dates', 'yhat'}) or (symbol, None)."""
+    name = None
+
+    def forecast_many(self, items, periods):
+        raise NotImplementedError
+
+    def forecast_one(self, symbol, prices, periods):
+        for _, path in self.forecast_many([(symbol, prices)], periods):
+            if path is None:
+                raise ValueError(f"{self.name} forecast failed")
+            return path
+        raise ValueError("Not enough historical data to predict (need at least 10 days).")
+
+class ProphetForecaster(Forecaster):
+    """Prophet fits (one per symbol), run through the process-pool engine."""
+    name = "prophet"
+
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def forecast_many(self, items, periods):
+        return (self.engine or get_engine()).forecast_many(items, periods)
+
+    def forecast_one(self, symbol, prices, periods):
+        return forecast_path(symbol, prices, periods)
+
+class NumpyForecaster(Forecaster):
+    """Base for pure-NumPy backends that forecast every symbol in one batched pass.
+
+    Histories are right-aligned into a (symbols x days) matrix padded with NaN on the left,
+    so symbols with different history lengths share the same computation.
+    """
+
+    def _predict(self, Y, valid, periods):
+        raise NotImplementedError
+
+    def forecast_many(self, items, periods):
+        import numpy as np
+        items = [(symbol, prices) for symbol, prices in items if prices and len(prices) >= MIN_HISTORY]
+        if not items:
+            return
+        width = max(len(prices) for _, prices in items)
+        Y = np.full((len(items), width), np.nan)
+        for row, (_, prices) in enumerate(items):
+            Y[row, width - len(prices):] = prices
+        valid = ~np.isnan(Y)
+        yhat = self._predict(Y, valid, periods)
+        for row, (symbol, prices) in enumerate(items):
+            values = yhat[row, width - len(prices):]
+            if not np.all(np.isfinite(values)):
+                yield symbol, None
+                continue
+            yield symbol, {'dates': _path_dates(len(prices), periods), 'yhat': values.tolist()}
+
+class LinearTrendForecaster(NumpyForecaster):
+    """Least-squares linear trend per symbol, solved in closed form for all rows at once."""
+    name = "linear"
+
+    def _predict(self, Y, valid, periods):
+        import numpy as np
+        width = Y.shape[1]
+        x = np.arange(width + periods, dtype=float)
+        w = valid.astype(float)
+        y = np.where(valid, Y, 0.0)
+        xs = x[:width]
+        sw = w.sum(axis=1)
+        sx = w @ xs
+        sy = y.sum(axis=1)
+        sxx = w @ (xs * xs)
+        sxy = y @ xs
+        denom = sw * sxx - sx * sx
+        with np.errstate(invalid="ignore", divide="ignore"):
+            slope = np.where(denom != 0, (sw * sxy - sx * sy) / denom, 0.0)
+        intercept = (sy - slope * sx) / sw
+        return intercept[:, None] + slope[:, None] * x[None, :]
+
+class ExpSmoothingForecaster(NumpyForecaster):
+    """Holt's linear exponential smoothing, vectorized across symbols (loops over days only)."""
+    name = "ets"
+
+    def __init__(self, alpha=0.5, beta=0.3):
+        self.alpha = alpha
+        self.beta = beta
+
+    def _predict(self, Y, valid, periods):
+        import numpy as np
+        rows, width = Y.shape
+        level = np.full(rows, np.nan)
+        trend = np.zeros(rows)
+        fitted = np.full((rows, width + periods), np.nan)
+        for t in range(width):
+            y = Y[:, t]
+            start = valid[:, t] & np.isnan(level)
+            update = valid[:, t] & ~start
+            fitted[:, t] = np.where(start, y, level + trend)
+            new_level = self.alpha * y + (1 - self.alpha) * (level + trend)
+            new_trend = self.beta * (new_level - level) + (1 - self.beta) * trend
+            level = np.where(update, new_level, np.where(start, y, level))
+            trend = np.where(update, new_trend, trend)
+        steps = np.arange(1, periods + 1)
+        fitted[:, width:] = level[:, None] + trend[:, None] * steps[None, :]
+        return fitted
+
+FORECASTERS = {
+    "prophet": ProphetForecaster,
+    "linear": LinearTrendForecaster,
+    "ets": ExpSmoothingForecaster,
+}
+
+def prophet_available():
+    import importlib.util
+    return importlib.util.find_spec("prophet") is not None
+
+def get_forecaster(backend=None):
+    """Resolve a backend name (or instance) to a Forecaster; Prophet falls back to `linear` if not installed."""
+    if isinstance(backend, Forecaster):
+        return backend
+    name = (backend or FORECAST_BACKEND).lower()
+    if name not in FORECASTERS:
+        raise ValueError(f"Unknown forecast backend '{name}' (choose from {', '.join(FORECASTERS)})")
+    if name == "prophet" and not prophet_available():
+        name = "linear"
+    return FORECASTERS[name]()
@@ -0,0 +1,63 @@
+"""Rendered HTML fragments of the portfolio page, keyed by what they were rendered from.
+
+Keys carry the user's portfolio version (see `portfolio_version` in storage.py) and, for
+fragments showing prices, the quote snapshot stamp (see QuoteCache.stamp), so a trade or a quote
+refresh simply stops matching old entries; nothing has to be invalidated explicitly and stale
+entries age out of the LRU.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+FRAGMENT_CACHE_MAXSIZE = int(os.getenv("FRAGMENT_CACHE_MAXSIZE", "256"))
+
+
+def etag_for(*parts):
+    """Strong ETag value (without quotes) identifying a response built from `parts`."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+class FragmentCache:
+    def __init__(self, maxsize=FRAGMENT_CACHE_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_or_render(self, key, render):
+        """Cached value for `key`, calling `render()` on a miss; key None renders without caching."""
+        if key is None:
+            return render()
+        value = self.get(key)
+        if value is None:
+            self.misses += 1
+            return self.put(key, render())
+        self.hits += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+fragment_cache = FragmentCache()
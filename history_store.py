@@ -0,0 +1,239 @@
+"""On-disk daily close history, one pair of raw NumPy columns per symbol.
+
+`<HISTORY_DIR>/<SYMBOL>.days` holds int64 day numbers (days since 1970-01-01) and
+`<SYMBOL>.close` the float64 closes. Both only grow at the end and are read through np.memmap, so a window
+is a zero-copy slice. A refresh downloads only the days after the last stored bar (the last bar
+itself is re-fetched since it may be today's partial bar), for all stale symbols in one request.
+With HISTORY_OFFLINE=1, or when the download fails, whatever is stored is served as-is.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+import warnings
+
+HISTORY_DIR = os.getenv("HISTORY_DIR", ".history")
+HISTORY_REFRESH_TTL = float(os.getenv("HISTORY_REFRESH_TTL", "900"))
+HISTORY_OFFLINE = os.getenv("HISTORY_OFFLINE", "0") == "1"
+EPOCH = datetime.date(1970, 1, 1)
+SINCE_SLACK_DAYS = 7  # a window's first bar may come a few days after its start (weekends, holidays)
+
+
+def day_number(date):
+    return (date - EPOCH).days
+
+def from_day_number(n):
+    return EPOCH + datetime.timedelta(days=int(n))
+
+def calendar_days(sessions):
+    """Calendar days that hold at least `sessions` trading days (weekends plus a margin for holidays)."""
+    return sessions * 7 // 5 + 7
+
+
+# --- Upstream fetch ---
+def download_history(symbols, start):
+    """{symbol: [(day_number, close), ...]} from `start` (a date) for all symbols in one download.
+
+    A symbol yfinance doesn't know gets no rows; one whose download failed otherwise is left out,
+    so the store tries it again on the next refresh.
+    """
+    import pandas as pd
+    import yfinance as yf
+    from quote_cache import missing_tickers
+    symbols = list(symbols)
+    with missing_tickers() as unknown, warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        data = yf.download(symbols, start=start.isoformat(), progress=False, threads=True)
+    result = {symbol: [] for symbol in symbols if symbol in unknown}
+    if data is None or data.empty:
+        return result
+    close = data["Close"]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbols[0])
+    for symbol in symbols:
+        series = close[symbol].dropna() if symbol in close.columns else None
+        if series is not None and not series.empty:
+            result[symbol] = [(day_number(ts.date()), float(price)) for ts, price in series.items()]
+    return result
+
+
+def provider_history(symbols, start):
+    """Closes from the configured market-data provider (MARKET_DATA_PROVIDER, see market_data.py)."""
+    from market_data import get_provider
+    return get_provider().history(symbols, start)
+
+
+# --- Store ---
+class HistoryStore:
+    def __init__(self, directory=HISTORY_DIR, refresh_ttl=HISTORY_REFRESH_TTL, offline=HISTORY_OFFLINE,
+                 fetcher=provider_history):
+        self.directory = directory
+        self.refresh_ttl = refresh_ttl
+        self.offline = offline
+        self.fetcher = fetcher
+        self._lock = threading.RLock()
+        self._maps = {}  # symbol -> (size, days, closes)
+        self._inflight = {}  # symbol -> Event set once its running download has been written
+        self.upstream_calls = 0
+
+    def _path(self, symbol, ext):
+        return os.path.join(self.directory, f"{symbol.replace('/', '_')}.{ext}")
+
+    def _meta(self, symbol):
+        path = self._path(symbol, "meta.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save_meta(self, symbol, meta):
+        tmp = self._path(symbol, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(symbol, "meta.json"))
+
+    def arrays(self, symbol):
+        """(days, closes) for everything stored, as read-only memory-mapped arrays."""
+        import numpy as np
+        path = self._path(symbol, "close")
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        cached = self._maps.get(symbol)
+        if cached is not None and cached[0] == size:
+            return cached[1], cached[2]
+        if size == 0:
+            days, closes = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        else:
+            n = size // 8
+            days = np.memmap(self._path(symbol, "days"), dtype=np.int64, mode="r", shape=(n,))
+            closes = np.memmap(path, dtype=np.float64, mode="r", shape=(n,))
+        self._maps[symbol] = (size, days, closes)
+        return days, closes
+
+    def window(self, symbol, days):
+        """Zero-copy (days, closes) slices covering the last `days` calendar days."""
+        import numpy as np
+        all_days, closes = self.arrays(symbol)
+        start = day_number(datetime.date.today()) - days + 1
+        i = int(np.searchsorted(all_days, start, side="left"))
+        return all_days[i:], closes[i:]
+
+    def closes(self, symbol, days):
+        return self.window(symbol, days)[1]
+
+    def recent(self, symbol, sessions):
+        """Zero-copy (days, closes) slices of the last `sessions` bars (trading days, like yfinance's
+        period="5d"), counting only bars inside the calendar window that should hold them."""
+        all_days, closes = self.window(symbol, calendar_days(sessions))
+        i = max(0, len(all_days) - sessions)
+        return all_days[i:], closes[i:]
+
+    def recent_closes(self, symbol, sessions):
+        return self.recent(symbol, sessions)[1]
+
+    def _write(self, symbol, rows):
+        """Overwrite stored bars from the first day in `rows` onwards with `rows`.
+
+        Bars are only ever overwritten or appended in place, never truncated, so slices that
+        readers still hold stay valid. Stored bars before the first returned day are kept even if
+        the fetch asked for them. The days column is written first, so the closes column never
+        reports bars whose day is missing.
+        """
+        import numpy as np
+        all_days, _ = self.arrays(symbol)
+        keep = int(np.searchsorted(all_days, rows[0][0], side="left"))
+        os.makedirs(self.directory, exist_ok=True)
+        for ext, values, dtype in (("days", [r[0] for r in rows], np.int64), ("close", [r[1] for r in rows], np.float64)):
+            path = self._path(symbol, ext)
+            with open(path, "r+b" if os.path.exists(path) else "wb") as f:
+                f.seek(keep * 8)
+                f.write(np.asarray(values, dtype=dtype).tobytes())
+
+    def _rewrite(self, symbol, rows):
+        """Replace both columns atomically (new files, so existing memory maps are untouched)."""
+        import numpy as np
+        os.makedirs(self.directory, exist_ok=True)
+        for ext, values, dtype in (("days", [r[0] for r in rows], np.int64), ("close", [r[1] for r in rows], np.float64)):
+            path = self._path(symbol, ext)
+            with open(path + ".tmp", "wb") as f:
+                f.write(np.asarray(values, dtype=dtype).tobytes())
+            os.replace(path + ".tmp", path)
+        self._maps.pop(symbol, None)
+
+    def refresh(self, symbols, days):
+        """Fetch the missing trailing days of every stale symbol with one batched download.
+
+        Only the planning and the writes hold the lock; the download doesn't, so readers and
+        refreshes of other symbols aren't held up by a slow fetch. A symbol another refresh is
+        already downloading isn't fetched twice: this call waits for that download instead.
+        """
+        if self.offline:
+            return
+        today = datetime.date.today()
+        wanted_start = day_number(today) - days + 1
+        now = time.time()
+        plans = {}  # symbol -> (fetch_from, rewrite)
+        pending = set()  # downloads by other refreshes that cover some of these symbols
+        with self._lock:
+            for symbol in dict.fromkeys(s.upper() for s in symbols if s):
+                if symbol in self._inflight:
+                    pending.add(self._inflight[symbol])
+                    continue
+                meta = self._meta(symbol)
+                stored_days, _ = self.arrays(symbol)
+                since = meta.get('since')
+                stale = now - meta.get('checked', 0) > self.refresh_ttl
+                # A window the provider couldn't fill (e.g. a young listing) is retried once per TTL
+                tried = not stale and meta.get('tried', wanted_start + 1) <= wanted_start
+                if ((since is None or since > wanted_start) and not tried) or (stale and len(stored_days) == 0):
+                    # Nothing stored for this window yet: fetch all of it
+                    plans[symbol] = (wanted_start, True)
+                elif stale:
+                    plans[symbol] = (int(stored_days[-1]), False)
+            if plans:
+                self.upstream_calls += 1
+                done = threading.Event()
+                for symbol in plans:
+                    self._inflight[symbol] = done
+        if plans:
+            try:
+                self._fetch(plans, now)
+            finally:
+                with self._lock:
+                    for symbol in plans:
+                        del self._inflight[symbol]
+                done.set()
+        for event in pending:
+            event.wait()
+
+    def _fetch(self, plans, now):
+        start = from_day_number(min(p[0] for p in plans.values()))
+        try:
+            fetched = self.fetcher(list(plans), start)
+        except Exception:
+            return  # offline: keep serving what is stored
+        with self._lock:
+            for symbol, (fetch_from, rewrite) in plans.items():
+                if symbol not in fetched:
+                    continue  # the download failed for it: retried on the next refresh
+                rows = [r for r in fetched[symbol] if r[0] >= fetch_from]
+                meta = self._meta(symbol)
+                if rewrite:
+                    # Window grew backwards (or first fetch): merge so older stored bars are kept
+                    stored_days, stored_closes = self.arrays(symbol)
+                    first = rows[0][0] if rows else None
+                    older = [(int(d), float(c)) for d, c in zip(stored_days, stored_closes) if first is None or d < first]
+                    self._rewrite(symbol, older + rows)
+                    # Only a download that reaches back to the window start covers it; after a partial
+                    # one the next refresh tries again
+                    if rows and rows[0][0] <= fetch_from + SINCE_SLACK_DAYS:
+                        meta['since'] = min(fetch_from, meta.get('since', fetch_from))
+                    meta['tried'] = fetch_from
+                elif rows:
+                    self._write(symbol, rows)
+                meta['checked'] = now
+                self._save_meta(symbol, meta)
+
+
+# Shared by the console app and the web app
+history_store = HistoryStore()
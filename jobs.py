@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "300"))
+
+
+class Job:
+    """A background job whose partial results can be read while it runs."""
+
+    def __init__(self, key, total=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.total = total
+        self.status = "running"
+        self.error = None
+        self.results = {}
+        self.started = time.time()
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def add_result(self, name, value):
+        with self._lock:
+            self.results[name] = value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'error': self.error,
+                'total': self.total,
+                'done': len(self.results),
+                'results': dict(self.results),
+            }
+
+
+class JobQueue:
+    """Thread pool that runs at most one job per key; repeat submits attach to the running job."""
+
+    def __init__(self, workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = {}  # key -> Job
+        self._lock = threading.Lock()
+
+    def _fresh(self, job, now):
+        return job.status == "running" or now - job.finished < self.result_ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not self._fresh(job, now):
+                del self._jobs[key]
+                job = None
+            return job
+
+    def submit(self, key, fn, *args, total=None):
+        """Start `fn(job, *args)` for `key` unless a running (or recently finished) job exists."""
+        now = time.time()
+        with self._lock:
+            for stale in [k for k, j in self._jobs.items() if not self._fresh(j, now)]:
+                del self._jobs[stale]
+            job = self._jobs.get(key)
+            if job is not None and (job.status == "running" or job.status == "done"):
+                return job
+            job = Job(key, total)
+            self._jobs[key] = job
+        self._executor.submit(self._run, job, fn, args)
+        return job
+
+    def _run(self, job, fn, args):
+        try:
+            fn(job, *args)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,494 @@
+"""Append-only transaction journal (event-sourced storage backend).
+
+Every trade is appended as one JSON line to `<LEDGER_DIR>/<user>.jsonl`; positions (shares and
+average cost price) are derived by replaying the journal. A snapshot with the last applied
+sequence number and journal offset is written every LEDGER_SNAPSHOT_EVERY events, so loading a
+user only replays the tail. Select it with `PORTFOLIO_STORAGE=journal`.
+
+    python ledger.py import            # one-shot import of portfolios.json/transactions.json
+    python ledger.py compact [USER...] # move replayed events to the archive, reset the live journal
+    python ledger.py check [USER...] [--repair]  # rebuild positions from scratch and compare
+"""
+import json
+import os
+import sys
+import threading
+from urllib.parse import quote, unquote
+
+from storage import TRANSACTIONS_PAGE_SIZE, JsonStorage, TradeError, TransactionIndex, apply_buy, apply_sell, apply_trade
+
+try:
+    import fcntl
+except ImportError:  # Windows: in-process locking only
+    fcntl = None
+
+LEDGER_DIR = os.getenv("LEDGER_DIR", "ledger")
+LEDGER_SNAPSHOT_EVERY = int(os.getenv("LEDGER_SNAPSHOT_EVERY", "100"))
+TRADE_ACTIONS = ("buy", "sell", "remove")
+
+
+# --- Replay ---
+def apply_event(positions, event, anomalies=None):
+    """Apply one journal event to a list of positions (same rules as the buy/sell paths)."""
+    action = event['action']
+    symbol = event['symbol']
+    if action == 'buy':
+        apply_buy(positions, symbol, event['shares'], event['price'])
+    elif action == 'sell':
+        try:
+            apply_sell(positions, symbol, event['shares'])
+        except TradeError as e:
+            # Only possible for imported legacy data; the write path validates first
+            if anomalies is None:
+                raise
+            anomalies.append(f"seq {event['seq']}: {e}")
+    elif action == 'remove':
+        positions[:] = [stock for stock in positions if stock['symbol'] != symbol]
+    elif action == 'adjust':
+        positions[:] = [stock for stock in positions if stock['symbol'] != symbol]
+        if event['shares'] > 0:
+            positions.append({'symbol': symbol, 'shares': event['shares'], 'cost_price': event['cost_price']})
+
+def replay(events, positions=None, anomalies=None):
+    positions = [] if positions is None else positions
+    for event in events:
+        apply_event(positions, event, anomalies)
+    return positions
+
+def _last_seq(path, chunk=65536):
+    """Seq of the last complete line in `path` (0 when empty or missing), read from the end of the file."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        tail = b""
+        while end > 0:
+            start = max(0, end - chunk)
+            f.seek(start)
+            tail = f.read(end - start) + tail
+            end = start
+            cut = tail.rfind(b"\n")  # a partially written last line is ignored
+            if cut < 0:
+                continue
+            begin = tail.rfind(b"\n", 0, cut) + 1
+            if begin > 0 or start == 0:
+                return json.loads(tail[begin:cut])['seq']
+    return 0
+
+def _read_events(path, offset=0):
+    """Yield (event, end_offset) for every complete line from `offset`."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partially written line; picked up on the next read
+            offset += len(line)
+            yield json.loads(line), offset
+
+
+class _UserState:
+    def __init__(self, seq=0, offset=0, positions=None, inode=None, since_snapshot=0):
+        self.seq = seq
+        self.offset = offset
+        self.positions = positions or []
+        self.inode = inode
+        self.since_snapshot = since_snapshot
+
+
+class _IndexState:
+    """A user's TransactionIndex and how far the archive and live journal have been read into it."""
+
+    def __init__(self):
+        self.index = TransactionIndex()
+        self.archive_offset = 0
+        self.inode = None
+        self.offset = 0
+
+
+# --- Storage backend ---
+class JournalStorage:
+    def __init__(self, directory=LEDGER_DIR, snapshot_every=LEDGER_SNAPSHOT_EVERY):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self._states = {}
+        self._indexes = {}  # username -> _IndexState
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # Paths
+    def _name(self, username):
+        return quote(username, safe='').replace('.', '%2E')
+
+    def journal_path(self, username):
+        return os.path.join(self.directory, f"{self._name(username)}.jsonl")
+
+    def archive_path(self, username):
+        return os.path.join(self.directory, f"{self._name(username)}.archive.jsonl")
+
+    def snapshot_path(self, username):
+        return os.path.join(self.directory, f"{self._name(username)}.snapshot.json")
+
+    def users(self):
+        names = []
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.endswith(".jsonl") and not filename.endswith(".archive.jsonl"):
+                names.append(unquote(filename[:-len(".jsonl")]))
+        return names
+
+    # State
+    def _lock(self, username):
+        with self._locks_guard:
+            return self._locks.setdefault(username, threading.RLock())
+
+    def _load_snapshot(self, username):
+        path = self.snapshot_path(username)
+        if not os.path.exists(path):
+            return _UserState()
+        with open(path, "r") as f:
+            snap = json.load(f)
+        return _UserState(snap['seq'], snap['offset'], snap['positions'])
+
+    def _state(self, username):
+        """Current state for the user, replaying only journal lines appended since the last read."""
+        path = self.journal_path(username)
+        inode = os.stat(path).st_ino if os.path.exists(path) else None
+        state = self._states.get(username)
+        if state is None or state.inode != inode or (inode is not None and os.path.getsize(path) < state.offset):
+            # First load, or the journal was compacted by another process: start from the snapshot
+            state = self._load_snapshot(username)
+            state.inode = inode
+        for event, offset in _read_events(path, state.offset):
+            state.offset = offset
+            if event['seq'] <= state.seq:
+                continue
+            apply_event(state.positions, event, anomalies=[])
+            state.seq = event['seq']
+            state.since_snapshot += 1
+        self._states[username] = state
+        return state
+
+    def _append(self, username, make_events, strict=True):
+        """Append events built from the current positions; `make_events` may raise TradeError."""
+        with self._lock(username):
+            path = self.journal_path(username)
+            with open(path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    state = self._state(username)
+                    positions = [dict(stock) for stock in state.positions]
+                    events = make_events(positions)
+                    lines = []
+                    for event in events:
+                        state.seq += 1
+                        event = {'seq': state.seq, **event}
+                        apply_event(state.positions, event, anomalies=None if strict else [])
+                        lines.append(json.dumps(event) + "\n")
+                    data = "".join(lines).encode()
+                    f.write(data)
+                    f.flush()
+                    state.offset += len(data)
+                    state.inode = os.fstat(f.fileno()).st_ino
+                    state.since_snapshot += len(lines)
+                    if state.since_snapshot >= self.snapshot_every:
+                        self._write_snapshot(username, state)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_snapshot(self, username, state):
+        path = self.snapshot_path(username)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({'seq': state.seq, 'offset': state.offset, 'positions': state.positions}, f)
+        os.replace(tmp, path)
+        state.since_snapshot = 0
+
+    # Storage API (see storage.py)
+    def load_all_portfolios(self):
+        return {username: self.get_portfolio(username) for username in self.users()}
+
+    def save_all_portfolios(self, data):
+        for username, portfolio in data.items():
+            self.save_portfolio(username, portfolio)
+
+    def iter_portfolios(self):
+        for username in self.users():
+            portfolio = self.get_portfolio(username)
+            self._states.pop(username, None)  # don't keep every user's state around during a full scan
+            yield username, portfolio
+
+    def load_all_transactions(self):
+        data = {}
+        for username in self.users():
+            transactions = self.get_transactions(username)
+            if transactions:
+                data[username] = transactions
+        return data
+
+    def save_all_transactions(self, data):
+        """Append only the transactions past what each user's history holds (as the SQLite backend does).
+
+        As in the other backends they are history only: adjustments after them restore the positions.
+        """
+        for username, transactions in data.items():
+            def append(positions, username=username, transactions=transactions):
+                stored = sum(1 for event in self.events(username) if event['action'] in TRADE_ACTIONS)
+                events = [{k: tx.get(k) for k in ('action', 'symbol', 'shares', 'price', 'datetime')}
+                          for tx in transactions[stored:]]
+                after = [dict(stock) for stock in positions]
+                for event in events:
+                    apply_event(after, {'seq': None, **event}, anomalies=[])
+                if after != positions:
+                    # Clear and re-add every position so their order is restored too
+                    events += [{'action': 'adjust', 'symbol': stock['symbol'], 'shares': 0, 'cost_price': 0.0} for stock in after]
+                    events += [{'action': 'adjust', **stock} for stock in positions]
+                return events
+            self._append(username, append, strict=False)
+
+    def has_user(self, username):
+        return os.path.exists(self.journal_path(username))
+
+    def get_portfolio(self, username):
+        with self._lock(username):
+            return [dict(stock) for stock in self._state(username).positions]
+
+    def events(self, username):
+        """Full history: archived events followed by the live journal.
+
+        Seqs only grow, so anything at or below the last one yielded is skipped: after a compaction
+        interrupted between archiving and resetting the journal, its events are in both files.
+        """
+        last = 0
+        for path in (self.archive_path(username), self.journal_path(username)):
+            for event, _ in _read_events(path):
+                if event['seq'] > last:
+                    last = event['seq']
+                    yield event
+
+    def get_transactions(self, username):
+        return [
+            {k: v for k, v in event.items() if k != 'seq'}
+            for event in self.events(username) if event['action'] in TRADE_ACTIONS
+        ]
+
+    def portfolio_version(self, username):
+        """Seq of the user's last event: every buy, sell, remove or adjustment bumps it."""
+        with self._lock(username):
+            return self._state(username).seq
+
+    def iter_transactions(self, username=None):
+        """Yield (username, transaction) from each user's archive and journal in turn, for one user or all."""
+        for user in [username] if username is not None else self.users():
+            for event in self.events(user):
+                if event['action'] in TRADE_ACTIONS:
+                    yield user, {k: v for k, v in event.items() if k != 'seq'}
+
+    def transaction_index(self, username):
+        """Per-user TransactionIndex, extended with only the events written since the last call.
+
+        Events are keyed by their seq, so ones read from the live journal and later moved into the
+        archive by a compaction are not indexed twice.
+        """
+        with self._lock(username):
+            state = self._indexes.get(username)
+            if state is None:
+                state = self._indexes[username] = _IndexState()
+            index = state.index
+
+            def read(path, offset):
+                for event, offset in _read_events(path, offset):
+                    if event['action'] in TRADE_ACTIONS and event['seq'] not in index:
+                        index.add(event['seq'], {k: v for k, v in event.items() if k != 'seq'})
+                return offset
+
+            state.archive_offset = read(self.archive_path(username), state.archive_offset)
+            path = self.journal_path(username)
+            inode = os.stat(path).st_ino if os.path.exists(path) else None
+            if inode != state.inode or (inode is not None and os.path.getsize(path) < state.offset):
+                state.inode, state.offset = inode, 0
+            state.offset = read(path, state.offset)
+            return index
+
+    def transactions_page(self, username, limit=TRANSACTIONS_PAGE_SIZE, cursor=None, symbol=None, action=None):
+        return self.transaction_index(username).page(limit, cursor, symbol, action)
+
+    def save_portfolio(self, username, portfolio):
+        """Record the difference to `portfolio` as position adjustments (used by the console app)."""
+        def diff(current):
+            wanted = {stock['symbol']: stock for stock in portfolio}
+            have = {stock['symbol']: stock for stock in current}
+            events = []
+            for symbol in have.keys() - wanted.keys():
+                events.append({'action': 'adjust', 'symbol': symbol, 'shares': 0, 'cost_price': 0.0})
+            for symbol, stock in wanted.items():
+                old = have.get(symbol)
+                if old is None or (old['shares'], old['cost_price']) != (stock['shares'], stock['cost_price']):
+                    events.append({'action': 'adjust', 'symbol': symbol,
+                                   'shares': stock['shares'], 'cost_price': stock['cost_price']})
+            return events
+        self._append(username, diff)
+
+    def buy(self, username, symbol, shares, price, when):
+        self._append(username, lambda positions: [
+            {'action': 'buy', 'symbol': symbol, 'shares': shares, 'price': price, 'datetime': when}])
+
+    def sell(self, username, symbol, shares, price, when):
+        def validate(positions):
+            apply_sell(positions, symbol, shares)
+            return [{'action': 'sell', 'symbol': symbol, 'shares': shares, 'price': price, 'datetime': when}]
+        self._append(username, validate)
+
+    def remove_position(self, username, symbol, when):
+        def removal(positions):
+            held = [stock for stock in positions if stock['symbol'] == symbol]
+            if not held:
+                return []
+            return [{'action': 'remove', 'symbol': symbol, 'shares': held[0]['shares'], 'price': None, 'datetime': when}]
+        self._append(username, removal)
+
+    def record_trades(self, trades):
+        """Apply a batch of trades, appended as one write per user; returns [(index, error)] rejected."""
+        by_user = {}
+        for i, trade in enumerate(trades):
+            by_user.setdefault(trade['username'], []).append((i, trade))
+        rejected = []
+        for username, batch in by_user.items():
+            def validate(positions, batch=batch):
+                events = []
+                for i, trade in batch:
+                    try:
+                        apply_trade(positions, trade)
+                    except TradeError as e:
+                        rejected.append((i, str(e)))
+                        continue
+                    events.append({k: trade[k] for k in ('action', 'symbol', 'shares', 'price', 'datetime')})
+                return events
+            self._append(username, validate)
+        return sorted(rejected)
+
+    # Maintenance
+    def snapshot(self, username):
+        with self._lock(username):
+            self._write_snapshot(username, self._state(username))
+
+    def compact(self, username):
+        """Move the live journal into the archive and restart it empty from a fresh snapshot."""
+        with self._lock(username):
+            path = self.journal_path(username)
+            if not os.path.exists(path):
+                return 0
+            with open(path, "rb+") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    state = self._state(username)
+                    # After an interrupted compaction the journal still starts with archived events
+                    archived = _last_seq(self.archive_path(username))
+                    start = next((offset - len(line) for line, offset in self._lines(f, state.offset)
+                                  if json.loads(line)['seq'] > archived), state.offset)
+                    f.seek(start)
+                    data = f.read(state.offset - start)
+                    with open(self.archive_path(username), "ab") as archive:
+                        archive.write(data)
+                        archive.flush()
+                        os.fsync(archive.fileno())
+                    # A crash from here until the journal is replaced leaves these events in both files:
+                    # events() and the replay skip seqs already seen, and the next compact or check --repair
+                    # finishes the job without archiving them twice
+                    tmp = path + ".tmp"
+                    open(tmp, "wb").close()
+                    state.offset = 0
+                    self._write_snapshot(username, state)
+                    os.replace(tmp, path)
+                    state.inode = os.stat(path).st_ino
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            return data.count(b"\n")
+
+    @staticmethod
+    def _lines(f, end):
+        """Yield (line, end offset) for the complete lines of open file `f` before `end`."""
+        f.seek(0)
+        offset = 0
+        for line in f:
+            if offset >= end or not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            yield line, offset
+
+    def check(self, username, repair=False):
+        """Rebuild positions from the full history and compare with the snapshot-based state.
+
+        Returns a list of problems (empty when consistent); `repair` rewrites the snapshot
+        from the rebuilt positions.
+        """
+        with self._lock(username):
+            anomalies = []
+            rebuilt = replay(self.events(username), anomalies=anomalies)
+            self._states.pop(username, None)
+            state = self._state(username)
+            problems = list(anomalies)
+            archived = _last_seq(self.archive_path(username))
+            first = next((event['seq'] for event, _ in _read_events(self.journal_path(username))), None)
+            if first is not None and first <= archived:
+                problems.append(f"journal repeats archived events seq {first}..{archived} (interrupted compaction)")
+            current = {stock['symbol']: stock for stock in state.positions}
+            expected = {stock['symbol']: stock for stock in rebuilt}
+            for symbol in sorted(current.keys() | expected.keys()):
+                a, b = current.get(symbol), expected.get(symbol)
+                if a is None or b is None or a['shares'] != b['shares'] or abs(a['cost_price'] - b['cost_price']) > 1e-9:
+                    problems.append(f"{symbol}: stored {a} != rebuilt {b}")
+            if repair and problems:
+                state.positions = rebuilt
+                self._write_snapshot(username, state)
+                if first is not None and first <= archived:
+                    self.compact(username)
+            return problems
+
+    def import_from(self, source=None):
+        """One-shot import: historical transactions, then adjustments to the stored positions."""
+        source = source or JsonStorage()
+        portfolios = source.load_all_portfolios()
+        all_transactions = source.load_all_transactions()
+        imported = 0
+        for username in sorted(set(portfolios) | set(all_transactions)):
+            if self.has_user(username):
+                continue
+            transactions = all_transactions.get(username, [])
+            self._append(username, lambda positions: [
+                {k: tx.get(k) for k in ('action', 'symbol', 'shares', 'price', 'datetime')} for tx in transactions],
+                strict=False)
+            self.save_portfolio(username, portfolios.get(username, []))
+            imported += 1
+        return imported
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    args = [a for a in sys.argv[2:] if not a.startswith("--")]
+    ledger = JournalStorage()
+    if command == "import":
+        print(f"✅ Imported {ledger.import_from()} users into {ledger.directory}/.")
+    elif command == "compact":
+        for username in args or ledger.users():
+            print(f"🗜️  {username}: archived {ledger.compact(username)} events.")
+    elif command == "check":
+        failed = False
+        for username in args or ledger.users():
+            problems = ledger.check(username, repair="--repair" in sys.argv)
+            if problems:
+                failed = True
+                print(f"⚠️  {username}:")
+                for problem in problems:
+                    print(f"  {problem}")
+            else:
+                print(f"✅ {username}: consistent")
+        sys.exit(1 if failed else 0)
+    else:
+        print(__doc__)
+        sys.exit(1)
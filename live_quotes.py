@@ -0,0 +1,177 @@
+"""Live quotes for Server-Sent Events: one shared poller fanning prices out to every subscriber.
+
+The poller fetches the union of all subscribed symbols once per LIVE_QUOTE_INTERVAL seconds,
+however many clients watch them, and runs only while someone is subscribed. Each subscription
+holds at most one pending price per symbol: a slow client that hasn't read the previous update
+gets the newer price merged into it instead of a growing backlog. LIVE_QUOTE_SOURCE=fake swaps in a
+local random-walk feed (no network) for tests and demos.
+"""
+import logging
+import os
+import random
+import threading
+import zlib
+
+from quote_cache import provider_quotes, quote_cache
+
+LIVE_QUOTE_INTERVAL = float(os.getenv("LIVE_QUOTE_INTERVAL", "15"))
+LIVE_QUOTE_SOURCE = os.getenv("LIVE_QUOTE_SOURCE", "provider")
+
+logger = logging.getLogger(__name__)
+
+
+# --- Quote sources: callables taking a list of symbols, returning {symbol: price or None} ---
+def provider_source(symbols):
+    """Fresh quotes from the market-data provider; they also refresh the shared quote cache used by page loads."""
+    prices = provider_quotes(symbols)
+    for symbol, price in prices.items():
+        if price is not None:
+            quote_cache.put(symbol, price)
+    return prices
+
+class FakeQuoteFeed:
+    """Deterministic random walk per symbol, starting from a price derived from the ticker."""
+
+    def __init__(self, seed=0, volatility=0.002):
+        self.volatility = volatility
+        self._random = random.Random(seed)
+        self._prices = {}
+        self.calls = 0
+
+    def __call__(self, symbols):
+        self.calls += 1
+        prices = {}
+        for symbol in symbols:
+            price = self._prices.get(symbol)
+            if price is None:
+                price = 50.0 + zlib.crc32(symbol.encode()) % 45000 / 100
+            else:
+                price *= 1 + self._random.gauss(0, self.volatility)
+            self._prices[symbol] = prices[symbol] = round(price, 4)
+        return prices
+
+SOURCES = {"provider": provider_source, "yfinance": provider_source, "fake": FakeQuoteFeed}  # "yfinance": old name
+
+def get_source(name=LIVE_QUOTE_SOURCE):
+    if name not in SOURCES:
+        raise ValueError(f"Unknown LIVE_QUOTE_SOURCE '{name}' (choose from {', '.join(SOURCES)})")
+    source = SOURCES[name]
+    return source() if isinstance(source, type) else source
+
+
+# --- Fan-out ---
+class Subscription:
+    def __init__(self, hub, symbols):
+        self.hub = hub
+        self.symbols = frozenset(symbols)
+        self._pending = {}
+        self._ready = threading.Condition()
+        self.closed = False
+        self.coalesced = 0  # prices replaced before the client read them
+
+    def publish(self, prices):
+        with self._ready:
+            self.coalesced += len(self._pending.keys() & prices.keys())
+            self._pending.update(prices)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """Prices changed since the last call ({} on timeout or when closed)."""
+        with self._ready:
+            if not self._pending and not self.closed:
+                self._ready.wait(timeout)
+            pending, self._pending = self._pending, {}
+            return pending
+
+    def close(self):
+        with self._ready:
+            self.closed = True
+            self._ready.notify()
+        self.hub.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class QuoteHub:
+    def __init__(self, source=None, interval=LIVE_QUOTE_INTERVAL):
+        self.source = source if source is not None else get_source()
+        self.interval = interval
+        self._subscriptions = set()
+        self._latest = {}  # symbol -> last published price
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.polls = 0
+        self.errors = 0
+
+    def subscribe(self, symbols):
+        """Subscription that first receives the prices already known, then every change."""
+        subscription = Subscription(self, {s.upper() for s in symbols if s})
+        with self._lock:
+            self._subscriptions.add(subscription)
+            known = {s: self._latest[s] for s in subscription.symbols if s in self._latest}
+            if known:
+                # Under the lock, so a concurrent poll can't publish a newer price before this one
+                subscription.publish(known)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quote-hub", daemon=True)
+                self._thread.start()
+        if len(known) < len(subscription.symbols):
+            self._wake.set()  # don't make a new client wait a full interval for its first prices
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def subscribers(self):
+        return len(self._subscriptions)
+
+    def poll(self):
+        """Fetch every watched symbol once and publish the changes; returns what was fetched."""
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        symbols = sorted(set().union(*(s.symbols for s in subscriptions))) if subscriptions else []
+        if not symbols:
+            return {}
+        self.polls += 1
+        try:
+            fetched = self.source(symbols)
+        except Exception:
+            self.errors += 1
+            logger.exception("live quote poll failed")
+            return {}
+        with self._lock:
+            changed = {s: p for s, p in fetched.items() if p is not None and self._latest.get(s) != p}
+            self._latest.update(changed)
+            for subscription in self._subscriptions:
+                update = {s: p for s, p in changed.items() if s in subscription.symbols}
+                if update:
+                    subscription.publish(update)
+        return fetched
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscriptions:
+                    self._thread = None
+                    return
+            self._wake.clear()
+            self.poll()
+            self._wake.wait(self.interval)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_hub():
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = QuoteHub()
+        return _hub
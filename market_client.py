@@ -0,0 +1,165 @@
+"""Asyncio market-data client: concurrent per-symbol chart requests over one pooled HTTP session.
+
+Each process gets one client (`get_client()`). Its aiohttp session lives on its own event-loop thread,
+so keep-alive connections (and their TLS sessions) are reused across page loads and reports.
+Synchronous callers (Flask views, the console app, the quote cache) submit coroutines with
+`client.run(...)`. At most MARKET_DATA_CONCURRENCY requests per host are in flight; the rest queue for
+a connection. Timeouts, connection errors, 429 and 5xx responses are retried MARKET_DATA_RETRIES times
+with jittered exponential backoff (a random delay up to MARKET_DATA_BACKOFF * 2**attempt seconds).
+
+Requests use the Yahoo Finance chart API shape (`/v8/finance/chart/<SYMBOL>`), which the stand-in
+server (`python market_data.py serve`) also speaks, so the client can be tested offline.
+"""
+import asyncio
+import atexit
+import os
+import random
+import threading
+import time
+from urllib.parse import quote as quote_path, urlsplit
+
+from history_store import day_number
+
+MARKET_DATA_URL = os.getenv("MARKET_DATA_URL", "https://query1.finance.yahoo.com")
+MARKET_DATA_CONCURRENCY = int(os.getenv("MARKET_DATA_CONCURRENCY", "8"))
+MARKET_DATA_RETRIES = int(os.getenv("MARKET_DATA_RETRIES", "3"))
+MARKET_DATA_BACKOFF = float(os.getenv("MARKET_DATA_BACKOFF", "0.25"))
+MARKET_DATA_TIMEOUT = float(os.getenv("MARKET_DATA_TIMEOUT", "10"))
+CHART_PATH = "/v8/finance/chart/"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+SECONDS_PER_DAY = 86400
+USER_AGENT = "Mozilla/5.0 (portfolio-tracker)"
+
+
+def _aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        raise RuntimeError("MARKET_DATA_PROVIDER=http needs aiohttp (pip install aiohttp)") from None
+    return aiohttp
+
+
+def parse_chart(data):
+    """[(day number, close), ...] from a chart response, skipping bars without a close."""
+    results = ((data or {}).get("chart") or {}).get("result") or []
+    if not results:
+        return []
+    result = results[0]
+    quotes = (result.get("indicators") or {}).get("quote") or [{}]
+    closes = quotes[0].get("close") or []
+    return [(int(ts) // SECONDS_PER_DAY, float(close))
+            for ts, close in zip(result.get("timestamp") or [], closes) if close is not None]
+
+
+class MarketDataClient:
+    def __init__(self, base_url=MARKET_DATA_URL, concurrency=MARKET_DATA_CONCURRENCY, retries=MARKET_DATA_RETRIES,
+                 backoff=MARKET_DATA_BACKOFF, timeout=MARKET_DATA_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.host = urlsplit(self.base_url).netloc
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._loop = None
+        self._session = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+
+    # --- Event loop (one background thread per client) ---
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="market-data-client", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro):
+        """Run `coro` on the client's event loop from synchronous code and return its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    def _get_session(self):
+        # Created on first use, on the client's loop (an aiohttp session is bound to the loop it was made on)
+        if self._session is None:
+            aiohttp = _aiohttp()
+            connector = aiohttp.TCPConnector(limit_per_host=self.concurrency, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, headers={"User-Agent": USER_AGENT},
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), loop).result()
+            self._session = None
+        loop.call_soon_threadsafe(loop.stop)
+
+    # --- Requests ---
+    async def get_json(self, path, params=None):
+        """GET base_url + path as JSON, retrying transient failures; None for a 4xx (e.g. unknown symbol)."""
+        aiohttp = _aiohttp()
+        session = self._get_session()
+        for attempt in range(self.retries + 1):
+            self.requests += 1
+            try:
+                async with session.get(self.base_url + path, params=params) as response:
+                    if response.status not in RETRY_STATUSES:
+                        if 400 <= response.status < 500:
+                            return None
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+                    error = RuntimeError(f"HTTP {response.status} from {self.host}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt == self.retries:
+                self.failures += 1
+                raise error
+            self.retried += 1
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+    async def chart(self, symbol, **params):
+        data = await self.get_json(CHART_PATH + quote_path(symbol), {"interval": "1d", **params})
+        return parse_chart(data)
+
+    async def _each(self, symbols, fetch):
+        """{symbol: fetch(symbol)} run concurrently. A symbol that keeps failing is left out (so the quote
+        cache doesn't take it for unknown); if every request failed the error is raised."""
+        symbols = list(symbols)
+        results = await asyncio.gather(*(fetch(symbol) for symbol in symbols), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors and len(errors) == len(results):
+            raise errors[0]
+        return {symbol: r for symbol, r in zip(symbols, results) if not isinstance(r, BaseException)}
+
+    async def quotes(self, symbols):
+        """{symbol: latest close or None}, one request per symbol, all in flight together."""
+        async def latest(symbol):
+            bars = await self.chart(symbol, range="5d")
+            return bars[-1][1] if bars else None
+        return await self._each(symbols, latest)
+
+    async def history(self, symbols, start):
+        """{symbol: [(day number, close), ...]} from `start` (a date), one request per symbol."""
+        period1 = day_number(start) * SECONDS_PER_DAY
+        period2 = int(time.time())
+        bars = await self._each(symbols, lambda symbol: self.chart(symbol, period1=period1, period2=period2))
+        return {symbol: rows or [] for symbol, rows in bars.items()}
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The process's shared client (a forked worker builds its own rather than reuse the parent's sockets)."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client, _client_pid = MarketDataClient(), os.getpid()
+            atexit.register(_client.close)
+        return _client
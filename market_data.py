@@ -0,0 +1,318 @@
+"""Market-data providers: where quotes and daily closes come from.
+
+A provider has `quotes(symbols) -> {symbol: price or None}` and
+`history(symbols, start) -> {symbol: [(day_number, close), ...]}` (`start` is a date); None or no bars
+mean the symbol is unknown, and a symbol that couldn't be fetched is left out. The quote
+cache and the history store fetch through the one selected by MARKET_DATA_PROVIDER, so every
+price the apps show comes through here:
+
+- `yfinance` (default): live multi-ticker downloads.
+- `local`: deterministic and offline. It replays the closes recorded in MARKET_DATA_FILE,
+  shifted so the last recorded bar falls on the most recent weekday, and synthesizes a seeded
+  random walk for any other symbol (unless MARKET_DATA_SYNTHETIC=0, which makes them unknown).
+  MARKET_DATA_LATENCY adds a fixed delay per call to mimic the network.
+- `http`: concurrent per-symbol chart requests over one pooled keep-alive session per process
+  (market_client.py) against MARKET_DATA_URL, the Yahoo Finance chart API or the stand-in below.
+
+    python market_data.py record AAPL MSFT --days 730   # download closes into MARKET_DATA_FILE
+    python market_data.py serve --port 8765 --latency 0.05   # local-provider data over HTTP, for MARKET_DATA_URL
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from history_store import day_number, download_history, from_day_number
+from quote_cache import download_quotes
+
+MARKET_DATA_PROVIDER = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+MARKET_DATA_FILE = os.getenv("MARKET_DATA_FILE", "market_data.json")
+MARKET_DATA_SEED = int(os.getenv("MARKET_DATA_SEED", "0"))
+MARKET_DATA_SYNTHETIC = os.getenv("MARKET_DATA_SYNTHETIC", "1") == "1"
+MARKET_DATA_LATENCY = float(os.getenv("MARKET_DATA_LATENCY", "0"))
+SYNTHETIC_START = datetime.date(2015, 1, 2)
+
+
+class YFinanceProvider:
+    name = "yfinance"
+
+    def quotes(self, symbols):
+        return download_quotes(symbols)
+
+    def history(self, symbols, start):
+        return download_history(symbols, start)
+
+
+def _weekday(n):
+    return (n + 3) % 7 < 5  # day 0 (1970-01-01) was a Thursday
+
+def load_recording(path):
+    """{symbol: [(day number, close), ...]} from a recording file (missing file -> {})."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        data = json.load(f)
+    return {symbol.upper(): sorted((day_number(datetime.date.fromisoformat(day)), float(close)) for day, close in bars)
+            for symbol, bars in data.items() if bars}
+
+
+class LocalProvider:
+    name = "local"
+
+    def __init__(self, path=MARKET_DATA_FILE, seed=MARKET_DATA_SEED, synthetic=MARKET_DATA_SYNTHETIC,
+                 latency=MARKET_DATA_LATENCY, today=None):
+        self.recorded = load_recording(path)
+        self.seed = seed
+        self.synthetic = synthetic
+        self.latency = latency
+        self.today = today
+        self._replayed = {}  # symbol -> recorded (day numbers, closes), shifted to end on the last weekday
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _last_weekday(self):
+        n = day_number(self.today or datetime.date.today())
+        while not _weekday(n):
+            n -= 1
+        return n
+
+    def _synthesize(self, symbol, last):
+        # Regenerated on every call (about 3k draws) rather than kept, so memory doesn't grow with symbols
+        import numpy as np
+        key = zlib.crc32(symbol.encode())
+        rng = np.random.default_rng([self.seed, key])
+        days = np.arange(day_number(SYNTHETIC_START), last + 1)
+        days = days[_weekday(days)]
+        volatility = 0.01 + key % 20 / 1000
+        returns = rng.normal(0.0003, volatility, len(days))
+        closes = (20 + key % 48000 / 100) * np.exp(np.cumsum(returns))
+        return days, np.round(closes, 4)
+
+    def series(self, symbol):
+        """(day numbers, closes) arrays ending on the most recent weekday; None for an unknown symbol."""
+        import numpy as np
+        symbol = symbol.upper()
+        last = self._last_weekday()
+        if symbol in self.recorded:
+            with self._lock:
+                if symbol not in self._replayed:
+                    bars = self.recorded[symbol]
+                    shift = (last - bars[-1][0]) // 7 * 7  # whole weeks keep the bars on weekdays
+                    self._replayed[symbol] = (np.array([d + shift for d, _ in bars], dtype=np.int64),
+                                              np.array([c for _, c in bars], dtype=np.float64))
+                return self._replayed[symbol]
+        return self._synthesize(symbol, last) if self.synthetic else None
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def quotes(self, symbols):
+        self._call()
+        prices = {}
+        for symbol in symbols:
+            series = self.series(symbol)
+            prices[symbol] = float(series[1][-1]) if series is not None and len(series[1]) else None
+        return prices
+
+    def history(self, symbols, start):
+        self._call()
+        first = day_number(start)
+        result = {}
+        for symbol in symbols:
+            series = self.series(symbol)
+            if series is None:
+                result[symbol] = []
+                continue
+            i = int(series[0].searchsorted(first))
+            result[symbol] = list(zip(series[0][i:].tolist(), series[1][i:].tolist()))
+        return result
+
+
+class HttpProvider:
+    name = "http"
+
+    def quotes(self, symbols):
+        from market_client import get_client
+        client = get_client()
+        return client.run(client.quotes(symbols))
+
+    def history(self, symbols, start):
+        from market_client import get_client
+        client = get_client()
+        return client.run(client.history(symbols, start))
+
+
+PROVIDERS = {"yfinance": YFinanceProvider, "local": LocalProvider, "http": HttpProvider}
+
+_provider = None
+_provider_lock = threading.Lock()
+
+def get_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            if MARKET_DATA_PROVIDER not in PROVIDERS:
+                raise ValueError(f"Unknown MARKET_DATA_PROVIDER '{MARKET_DATA_PROVIDER}' (choose from {', '.join(PROVIDERS)})")
+            _provider = PROVIDERS[MARKET_DATA_PROVIDER]()
+        return _provider
+
+def set_provider(provider):
+    """Use `provider` from now on (e.g. a LocalProvider with latency in a benchmark); returns the old one."""
+    global _provider
+    with _provider_lock:
+        previous, _provider = _provider, provider
+        return previous
+
+
+def record(symbols, days=730, path=MARKET_DATA_FILE, provider=None):
+    """Download `days` of closes for `symbols` and merge them into the recording file."""
+    provider = provider or YFinanceProvider()
+    start = datetime.date.today() - datetime.timedelta(days=days)
+    fetched = provider.history([s.upper() for s in symbols], start)
+    data = {}
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            data = json.load(f)
+    for symbol, bars in fetched.items():
+        if bars:
+            data[symbol] = [[from_day_number(d).isoformat(), c] for d, c in bars]
+    with open(path, "w") as f:
+        json.dump(data, f)
+    return {symbol: len(bars) for symbol, bars in fetched.items()}
+
+
+# --- Stand-in server: local-provider data over the chart API, for testing the http provider offline ---
+CHART_PATH = "/v8/finance/chart/"
+BAR_OFFSET = 14 * 3600 + 1800  # bars are stamped at the US market open, 14:30 UTC
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse shows up in the stats
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        if url.path == "/stats":
+            return self._send(200, server.snapshot())
+        with server.tracking(self.client_address):
+            if server.latency:
+                time.sleep(server.latency)
+            if not url.path.startswith(CHART_PATH):
+                return self._send(404, {"error": "not found"})
+            if server.fail_rate and server.random.random() < server.fail_rate:
+                return self._send(503, {"error": "unavailable"})
+            symbol = unquote(url.path[len(CHART_PATH):]).upper()
+            series = server.provider.series(symbol)
+            if series is None:
+                return self._send(404, {"chart": {"result": None, "error": {"code": "Not Found", "description": f"No data found for {symbol}"}}})
+            self._send(200, chart_payload(symbol, series, parse_qs(url.query)))
+
+def chart_payload(symbol, series, params):
+    """The chart API's response shape for the bars of `series` selected by range= or period1=/period2=."""
+    days, closes = series
+    last = int(days[-1]) if len(days) else 0
+    if "range" in params:
+        first = last - int(params["range"][0].rstrip("d")) + 1
+    else:
+        first = int(params.get("period1", ["0"])[0]) // 86400
+        last = min(last, int(params.get("period2", [str(last * 86400)])[0]) // 86400)
+    lo, hi = int(days.searchsorted(first)), int(days.searchsorted(last, side="right"))
+    return {"chart": {"error": None, "result": [{
+        "meta": {"symbol": symbol, "currency": "USD", "regularMarketPrice": float(closes[hi - 1]) if hi > lo else None},
+        "timestamp": [int(d) * 86400 + BAR_OFFSET for d in days[lo:hi].tolist()],
+        "indicators": {"quote": [{"close": closes[lo:hi].tolist()}]},
+    }]}}
+
+class StandInServer(ThreadingHTTPServer):
+    """Serves `provider`'s bars with `latency` seconds per request and a `fail_rate` share of 503s.
+    GET /stats reports requests, connections and the most requests seen in flight at once."""
+    daemon_threads = True
+    request_queue_size = 128  # the default backlog of 5 drops connects from a concurrent client
+
+    def __init__(self, address=("127.0.0.1", 0), provider=None, latency=0.0, fail_rate=0.0, seed=0):
+        super().__init__(address, StandInHandler)
+        self.provider = provider or LocalProvider(latency=0)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._clients = set()
+        self.stats = {"requests": 0, "max_in_flight": 0}
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    @contextlib.contextmanager
+    def tracking(self, client_address):
+        with self._stats_lock:
+            self._in_flight += 1
+            self._clients.add(client_address)
+            self.stats["requests"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            return {**self.stats, "connections": len(self._clients)}
+
+    def start(self):
+        """Serve from a daemon thread; returns the server."""
+        threading.Thread(target=self.serve_forever, name="market-data-stand-in", daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record daily closes, or serve them for the http provider.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    recorder = commands.add_parser("record", help="download closes into MARKET_DATA_FILE")
+    recorder.add_argument("symbols", nargs="+")
+    recorder.add_argument("--days", type=int, default=730)
+    recorder.add_argument("--output", default=MARKET_DATA_FILE)
+    server = commands.add_parser("serve", help="serve local-provider data on the chart API (set MARKET_DATA_URL to it)")
+    server.add_argument("--host", default="127.0.0.1")
+    server.add_argument("--port", type=int, default=8765)
+    server.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    server.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered 503")
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        stand_in = StandInServer((args.host, args.port), latency=args.latency, fail_rate=args.fail_rate)
+        print(f"📡 Serving market data on {stand_in.url} (MARKET_DATA_PROVIDER=http MARKET_DATA_URL={stand_in.url})")
+        try:
+            stand_in.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+    for symbol, count in record(args.symbols, args.days, args.output).items():
+        print(f"{'✅' if count else '⚠️ '} {symbol}: {count} closes")
+    print(f"Saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,207 @@
+"""Timing spans, counters and histograms rendered in the Prometheus text format.
+
+`span(stage)` times a block, adds it to the `portfolio_stage_seconds` histogram and, inside a
+`collect()` block (one per web request or console report), to that block's list of spans, which
+the web app turns into a `Server-Timing` header (the console report prints them with
+REPORT_TIMINGS=1). Setting PROFILE_REQUESTS=1 writes a cProfile dump per request (or per console
+run) to PROFILE_DIR.
+"""
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", ".profiles")
+REPORT_TIMINGS = os.getenv("REPORT_TIMINGS", "0") == "1"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    pairs = (f'{n}="{escape(v)}"' for n, v in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+# --- Metric types ---
+class Counter:
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_labels(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram(Counter):
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]  # bucket counts, sum, count
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in sorted(self._values.items())]
+        names = self.labels + ("le",)
+        for labels, counts, total, count in items:
+            for bound, bucket in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {bucket}")
+            lines.append(f"{self.name}_bucket{_labels(names, labels + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class CallbackCounter(Counter):
+    """Counter (or gauge) whose value is read from elsewhere (e.g. QuoteCache.hits) at scrape time."""
+
+    def __init__(self, name, help, read, labels=(), type="counter"):
+        super().__init__(name, help, labels)
+        self.read = read
+        self.type = type
+
+    def samples(self):
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [(self.name, labels, value) for labels, value in sorted(values.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, read, labels=(), type="counter"):
+        return self.register(CallbackCounter(name, help, read, labels, type))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+stage_seconds = registry.histogram("portfolio_stage_seconds", "Time spent per stage (quotes, history, forecast, storage, render, ...).", ("stage",))
+
+
+# --- Spans ---
+_local = threading.local()
+
+class Collector:
+    """Spans recorded by one request or console run, in the order they finished."""
+
+    def __init__(self):
+        self.spans = []  # (stage, seconds)
+        self.started = time.perf_counter()
+
+    def totals(self):
+        totals = {}
+        for stage, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def server_timing(self):
+        """`Server-Timing` header value; repeated stages are summed."""
+        parts = [f"{re.sub(r'[^A-Za-z0-9_-]', '_', stage)};dur={seconds * 1000:.1f}" for stage, seconds in self.totals().items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+    def summary(self):
+        return ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in self.totals().items())
+
+
+def current():
+    return getattr(_local, "collector", None)
+
+def start():
+    _local.collector = Collector()
+    return _local.collector
+
+def stop():
+    collector, _local.collector = current(), None
+    return collector
+
+@contextmanager
+def collect():
+    previous = current()
+    collector = start()
+    try:
+        yield collector
+    finally:
+        _local.collector = previous
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        stage_seconds.observe(seconds, stage)
+        collector = current()
+        if collector is not None:
+            collector.spans.append((stage, seconds))
+
+
+# --- Profiling ---
+def start_profile():
+    """A running cProfile.Profile, or None when profiling is off or another profiler is active."""
+    if not PROFILE_REQUESTS:
+        return None
+    import cProfile
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return None  # only one profiler can be active at a time
+    return profile
+
+def dump_profile(profile, name):
+    """Stop `profile` and write it to PROFILE_DIR; returns the file path."""
+    profile.disable()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}-{time.perf_counter_ns() % 10**6}.prof")
+    profile.dump_stats(path)
+    return path
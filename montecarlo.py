@@ -0,0 +1,144 @@
+"""Monte Carlo projections of portfolio value over 1/3/5 years.
+
+Daily log-return drift and covariance are estimated from the aligned price matrix in risk.py.
+Correlated paths for every holding are drawn together: multivariate normal log returns through a
+Cholesky factor. Since the sum of i.i.d. normal daily log returns is again normal, each path is
+sampled exactly at the horizons (one correlated increment per gap, 0->1->3->5 years) instead of
+day by day. Paths are simulated MC_CHUNK at a time from one seeded generator, so memory stays
+bounded however many paths are requested. The report gives percentile bands per horizon.
+
+    python montecarlo.py --paths 100000   # paths/second benchmark on synthetic data
+"""
+import argparse
+import os
+import sys
+import time
+
+from history_store import history_store
+from lazy_imports import lazy_import
+from risk import TRADING_DAYS, fill_prices, price_matrix
+
+np = lazy_import("numpy")
+
+MC_PATHS = int(os.getenv("MC_PATHS", "10000"))
+MC_CHUNK = int(os.getenv("MC_CHUNK", "2000"))
+MC_SEED = int(os.getenv("MC_SEED", "42"))
+MC_HISTORY_DAYS = int(os.getenv("MC_HISTORY_DAYS", "730"))
+HORIZONS = {"1 year": 1, "3 years": 3, "5 years": 5}
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def estimate(prices):
+    """Mean and covariance of daily log returns from a (days x symbols) price matrix."""
+    log_returns = np.diff(np.log(prices), axis=0)
+    mu = log_returns.mean(axis=0)
+    cov = np.atleast_2d(np.cov(log_returns, rowvar=False))
+    return mu, cov
+
+
+def cholesky(cov):
+    """Lower Cholesky factor; near-singular covariances (e.g. duplicate series) are clipped to PSD."""
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+class Simulation:
+    """Correlated log-normal paths for positions worth `values` today."""
+
+    def __init__(self, mu, cov, values):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.mu = np.asarray(mu)
+        self.chol = cholesky(np.asarray(cov))
+
+    def run(self, paths=MC_PATHS, years=(1, 3, 5), seed=MC_SEED, chunk=MC_CHUNK):
+        """(paths x len(years)) portfolio values at each horizon."""
+        rng = np.random.default_rng(seed)
+        days = np.diff(np.concatenate([[0], np.asarray(years, dtype=np.float64) * TRADING_DAYS]))
+        drift = days[:, None] * self.mu      # (horizons, symbols)
+        scale = np.sqrt(days)[:, None]       # volatility grows with the square root of the gap
+        out = np.empty((paths, len(years)))
+        for start in range(0, paths, chunk):
+            size = min(chunk, paths - start)
+            shocks = rng.standard_normal((size * len(years), len(self.values))) @ self.chol.T
+            shocks = shocks.reshape(size, len(years), -1) * scale + drift
+            cumulative = np.cumsum(shocks, axis=1)  # log growth at each horizon
+            out[start:start + size] = np.exp(cumulative) @ self.values
+        return out
+
+
+def bands(values, invested):
+    """Percentile bands, mean and probability of loss for one horizon's simulated values."""
+    levels = np.percentile(values, PERCENTILES)
+    return {
+        'percentiles': {str(p): float(v) for p, v in zip(PERCENTILES, levels)},
+        'mean': float(values.mean()),
+        'prob_loss': float((values < invested).mean()),
+    }
+
+
+def project(portfolio, paths=MC_PATHS, seed=MC_SEED, history_days=MC_HISTORY_DAYS, horizons=HORIZONS,
+            chunk=MC_CHUNK, store=history_store):
+    """Monte Carlo bands for a stored portfolio ({'symbol', 'shares', 'cost_price'} list)."""
+    shares, invested = {}, 0.0
+    for stock in portfolio:
+        symbol = stock['symbol'].upper()
+        shares[symbol] = shares.get(symbol, 0) + stock['shares']
+        invested += stock['shares'] * stock['cost_price']
+    matrix = price_matrix(list(shares), history_days, store)
+    has_data = ~np.isnan(matrix.prices).all(axis=0) if len(matrix.days) else np.zeros(len(matrix.symbols), dtype=bool)
+    held = [i for i in range(len(matrix.symbols)) if has_data[i]]
+    report = {
+        'paths': paths,
+        'seed': seed,
+        'history_days': history_days,
+        'invested': invested,
+        'unavailable': [s for i, s in enumerate(matrix.symbols) if not has_data[i]],
+        'horizons': {},
+    }
+    if not held or len(matrix.days) < 3:
+        report['current_value'] = None
+        return report
+    prices = fill_prices(matrix.prices[:, held])
+    values = prices[-1] * np.array([shares[matrix.symbols[i]] for i in held], dtype=np.float64)
+    # Positions without history are left out of the simulation, so compare against what was simulated
+    simulated_invested = sum(stock['shares'] * stock['cost_price'] for stock in portfolio
+                             if stock['symbol'].upper() in {matrix.symbols[i] for i in held})
+    mu, cov = estimate(prices)
+    simulated = Simulation(mu, cov, values).run(paths, list(horizons.values()), seed, chunk)
+    report['current_value'] = float(values.sum())
+    report['simulated_invested'] = simulated_invested
+    for column, (label, years) in enumerate(horizons.items()):
+        report['horizons'][label] = {'years': years, **bands(simulated[:, column], simulated_invested)}
+    return report
+
+
+# --- Benchmark ---
+def benchmark(paths, symbols, chunk=MC_CHUNK, seed=MC_SEED):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0003, 0.015, (500, symbols))
+    prices = 100 * np.exp(np.cumsum(returns, axis=0))
+    mu, cov = estimate(prices)
+    simulation = Simulation(mu, cov, np.full(symbols, 1000.0))
+    start = time.perf_counter()
+    simulation.run(paths, list(HORIZONS.values()), seed, chunk)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Monte Carlo engine (paths per second).")
+    parser.add_argument("--paths", type=int, default=MC_PATHS)
+    parser.add_argument("--symbols", default="1,10,50")
+    parser.add_argument("--chunk", type=int, default=MC_CHUNK)
+    args = parser.parse_args(argv)
+    print("| Symbols | Paths | Time (s) | Paths/s |")
+    print("|---|---|---|---|")
+    for count in (int(s) for s in args.symbols.split(",")):
+        elapsed = benchmark(args.paths, count, args.chunk)
+        print(f"| {count} | {args.paths} | {elapsed:.3f} | {args.paths / elapsed:,.0f} |")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
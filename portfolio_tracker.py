@@ -1,62 +1,80 @@
-import json
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
-import yfinance as yf
-
-load_dotenv()
-
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY"),
-)
+from concurrent.futures import ThreadPoolExecutor
+from lazy_imports import lazy_import
+from quote_cache import quote_cache
+from symbol_registry import symbol_registry
+from history_store import calendar_days, history_store
+from valuation import value_portfolio
+from storage import get_storage
+import forecasting
+from forecasting import get_forecaster, horizon_prices
+from ai_summary import OpenAIProvider, get_summarizer
+from risk import RISK_BENCHMARK, RISK_WINDOW_DAYS, risk_report
+from montecarlo import MC_HISTORY_DAYS, MC_PATHS, project
+import metrics
+from metrics import span
+
+# 1/3/5-year projections: "montecarlo" (percentile bands) or "forecast" (per-symbol forecaster extrapolation)
+PROJECTION_METHOD = os.getenv("PROJECTION_METHOD", "montecarlo")
+
+# Heavy dependencies are imported on first use so the CLI starts fast
+dotenv = lazy_import("dotenv")
+
+def load_env():
+    try:
+        dotenv.load_dotenv()
+    except ImportError:
+        pass
 
-PORTFOLIO_FILE = "portfolios.json"
+def __getattr__(name):
+    # Keep `portfolio_tracker.client` working without constructing it at import time
+    if name == "client":
+        return OpenAIProvider().client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# 🔹 Fetch prices using yfinance
+# 🔹 Fetch prices using yfinance (shared TTL cache, batched downloads)
 def fetch_current_price(symbol):
-    import warnings
-    import yfinance as yf
-    try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            stock = yf.Ticker(symbol)
-            price = stock.history(period="1d")['Close']
-            if price.empty:
-                # Try a longer period if 1d fails
-                price = stock.history(period="7d")['Close']
-            if price.empty:
-                return None
-            return float(price.iloc[-1])
-    except Exception:
-        return None
+    with span("quotes"):
+        return quote_cache.get(symbol)
 
+def fetch_current_prices(symbols):
+    with span("quotes"):
+        return quote_cache.get_many(symbols)
+
+# 🔹 Daily closes for the last `days` trading sessions (only missing days are downloaded)
 def fetch_historical_prices(symbol, days=30):
-    import warnings
-    import yfinance as yf
-    try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            stock = yf.Ticker(symbol)
-            hist = stock.history(period=f"{days}d")['Close']
-            if hist.empty:
-                # Try a longer period if days fails
-                hist = stock.history(period="1mo")['Close']
-            if hist.empty:
-                return []
-            return [float(p) for p in hist.tolist()]
-    except Exception:
-        return []
-
-# 🔹 Load/Save Portfolios
+    with span("history"):
+        history_store.refresh([symbol], calendar_days(days))
+        return history_store.recent_closes(symbol.upper(), days).tolist()
+
+def fetch_historical_prices_many(symbols, days=30):
+    with span("history"):
+        history_store.refresh(symbols, calendar_days(days))
+        return {symbol: history_store.recent_closes(symbol.upper(), days).tolist() for symbol in symbols}
+
+# 🔹 Quotes and the longest history window the report reads, fetched in one concurrent round
+def prefetch_market_data(symbols, days):
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        history = pool.submit(history_store.refresh, symbols, days)
+        prices = fetch_current_prices(symbols)
+        history.result()
+    return prices
+
+# 🔹 Load/Save Portfolios (backend chosen by PORTFOLIO_STORAGE, see storage.py)
 def load_all_portfolios():
-    if not os.path.exists(PORTFOLIO_FILE):
-        return {}
-    with open(PORTFOLIO_FILE, "r") as f:
-        return json.load(f)
+    with span("storage"):
+        return get_storage().load_all_portfolios()
 
 def save_all_portfolios(data):
-    with open(PORTFOLIO_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    with span("storage"):
+        get_storage().save_all_portfolios(data)
+
+# 🔹 Buying price prompt (blank = the quote seen while validating the symbol)
+def read_cost_price(symbol, quote=None):
+    if quote is None:
+        return float(input(f"Enter buying price per share of {symbol}: $"))
+    answer = input(f"Enter buying price per share of {symbol} (blank for ${quote:.2f}): $").strip()
+    return float(answer) if answer else quote
 
 # 🔹 Get portfolio from user
 def get_user_portfolio():
@@ -67,12 +85,13 @@ def get_user_portfolio():
         symbol = input("Enter stock symbol (or 'done' to finish): ").upper()
         if symbol == 'DONE':
             break
-        if fetch_current_price(symbol) is None:
+        valid, quote = symbol_registry.check(symbol)
+        if not valid:
             print(f"⚠️  {symbol} not found or unavailable.")
             continue
         try:
             shares = int(input(f"Enter number of shares for {symbol}: "))
-            cost_price = float(input(f"Enter buying price per share of {symbol}: $"))
+            cost_price = read_cost_price(symbol, quote)
             portfolio.append({
                 "symbol": symbol,
                 "shares": shares,
@@ -95,7 +114,8 @@ def update_portfolio(portfolio):
             continue
 
         symbol = input("Enter stock symbol: ").upper()
-        if fetch_current_price(symbol) is None:
+        valid, quote = symbol_registry.check(symbol)
+        if not valid:
             print(f"⚠️  {symbol} not found or unavailable.")
             continue
 
@@ -109,7 +129,11 @@ def update_portfolio(portfolio):
             continue
 
         if action == 'buy':
-            cost_price = float(input(f"Enter buying price per share of {symbol}: $"))
+            try:
+                cost_price = read_cost_price(symbol, quote)
+            except ValueError:
+                print("⚠️  Invalid input. Please enter a numeric value for the price.")
+                continue
             found = False
             for stock in portfolio:
                 if stock["symbol"] == symbol:
@@ -145,57 +169,23 @@ def update_portfolio(portfolio):
     return portfolio
 
 # 🔹 Calculate & Show Portfolio Performance
-def predict_future_price(prices, periods):
-    from prophet import Prophet
-    import pandas as pd
-    import numpy as np
-    if not prices or len(prices) < 10:
-        raise ValueError("Not enough historical data to predict (need at least 10 days).")
-    # Create a DataFrame for Prophet
-    df = pd.DataFrame({
-        'ds': pd.date_range(end=pd.Timestamp.today(), periods=len(prices)),
-        'y': prices
-    })
-    model = Prophet(daily_seasonality=False, yearly_seasonality=False, weekly_seasonality=False)
-    model.fit(df)
-    # Forecast into the future
-    future = model.make_future_dataframe(periods=periods)
-    forecast = model.predict(future)
-    # Get the predicted price at the last period
-    predicted_price = forecast.iloc[-1]['yhat']
-    return predicted_price
-
 def calculate_portfolio_value(portfolio):
-    total_invested = 0
-    total_current = 0
-    highest_gain = None
-    lowest_gain = None
-
     print("\n📊 Portfolio Performance:")
-    for stock in portfolio:
-        symbol = stock["symbol"]
-        shares = stock["shares"]
-        cost = stock["cost_price"]
-        current = fetch_current_price(symbol)
-        if current is None:
+    prices = fetch_current_prices([stock["symbol"] for stock in portfolio])
+    with span("history"):
+        history_store.refresh([stock["symbol"] for stock in portfolio], calendar_days(5))
+    with span("valuation"):
+        valuation = value_portfolio(portfolio, prices)
+
+    for row in valuation.rows():
+        symbol = row["symbol"]
+        if row["current"] is None:
             print(f"⚠️  Could not fetch current price for {symbol}. Skipping.")
             continue
-
-        invested_value = shares * cost
-        current_value = shares * current
-        gain_loss = current_value - invested_value
-
-        if highest_gain is None or gain_loss > highest_gain['gain']:
-            highest_gain = {"symbol": symbol, "gain": gain_loss}
-        if lowest_gain is None or gain_loss < lowest_gain['gain']:
-            lowest_gain = {"symbol": symbol, "gain": gain_loss}
-
-        total_invested += invested_value
-        total_current += current_value
-
+        gain_loss = row["gain"]
         status = "gain" if gain_loss >= 0 else "loss"
-        print(f"- {symbol}: {shares} shares")
-        print(f"  Bought at ${cost:.2f}, Current ${current:.2f}")
+        print(f"- {symbol}: {row['shares']} shares")
+        print(f"  Bought at ${row['cost']:.2f}, Current ${row['current']:.2f}")
         print(f"  ➤ {status.upper()}: ${gain_loss:.2f}")
 
         # Historical trend
@@ -206,18 +196,58 @@ def calculate_portfolio_value(portfolio):
         else:
             print("  5-Day Trend: Data unavailable\n")
 
-    overall_gain = total_current - total_invested
+    # Positions without a quote are left out of the totals
+    overall_gain = valuation.priced_gain
 
     print("💼 Portfolio Summary")
-    print(f"  Total Invested: ${total_invested:.2f}")
-    print(f"  Current Value:  ${total_current:.2f}")
+    print(f"  Total Invested: ${valuation.priced_invested:.2f}")
+    print(f"  Current Value:  ${valuation.total_current:.2f}")
     print(f"  Overall Gain/Loss: ${overall_gain:.2f}")
-
-    # Generate LLM summary
-    generate_ai_summary(portfolio, overall_gain)
-
-def predict_portfolio_returns(portfolio):
-    print("\n🔮 Predicted Returns (Prophet Model):")
+    best, worst = valuation.top_movers(1), valuation.bottom_movers(1)
+    if best and worst:
+        print(f"  Top Mover: {best[0]['symbol']} (${best[0]['gain']:.2f}), Bottom Mover: {worst[0]['symbol']} (${worst[0]['gain']:.2f})")
+
+    return valuation
+
+# 🔹 Risk (volatility, beta, VaR/CVaR, drawdown) over the last RISK_WINDOW_DAYS of daily closes
+def show_risk_report(portfolio, days=RISK_WINDOW_DAYS):
+    with span("risk"):
+        report = risk_report(portfolio, days)
+    print(f"\n📉 Portfolio Risk (last {days} days):")
+    stats = report['portfolio']
+    if stats is None:
+        print("  Not enough historical data for risk metrics.")
+        return report
+    pct = lambda value: "n/a" if value is None else f"{value * 100:.2f}%"
+    num = lambda value: "n/a" if value is None else f"{value:.2f}"
+    confidence = f"{report['confidence'] * 100:.0f}%"
+    print(f"  Volatility (annualized): {pct(stats['volatility'])}")
+    print(f"  Beta vs {report['benchmark'] or 'benchmark'}: {num(stats['beta'])}")
+    print(f"  1-day VaR ({confidence}): {pct(stats['var'])} (${stats['var_amount']:.2f})")
+    print(f"  1-day CVaR ({confidence}): {pct(stats['cvar'])} (${stats['cvar_amount']:.2f})")
+    print(f"  Max Drawdown: {pct(stats['max_drawdown'])}")
+    for row in report['symbols']:
+        print(f"  - {row['symbol']}: volatility {pct(row['volatility'])}, beta {num(row['beta'])}, max drawdown {pct(row['max_drawdown'])}")
+    correlation = report['correlation']
+    pairs = [
+        (correlation['matrix'][i][j], a, b)
+        for i, a in enumerate(correlation['symbols']) for j, b in enumerate(correlation['symbols'])
+        if i < j and correlation['matrix'][i][j] is not None
+    ]
+    if pairs:
+        value, a, b = max(pairs)
+        print(f"  Most correlated: {a}/{b} ({value:.2f})")
+    if report['unavailable']:
+        print(f"  ⚠️  No history for: {', '.join(report['unavailable'])}")
+    return report
+
+# 🔹 Forecasts (backend chosen by FORECAST_BACKEND, see forecasting.py)
+def predict_future_price(prices, periods, symbol=None, backend=None):
+    return forecasting.predict_future_price(prices, periods, symbol, backend)
+
+def predict_portfolio_returns(portfolio, backend=None):
+    forecaster = get_forecaster(backend)
+    print(f"\n🔮 Predicted Returns ({forecaster.name.capitalize()} Model):")
     periods_map = {
         "1 year":  12,    # 12 months
         "3 years": 36,    # 36 months
@@ -227,12 +257,17 @@ def predict_portfolio_returns(portfolio):
     print(total_predicted)
     total_invested = 0
 
+    # Fetch at least 30 days of history, then forecast all symbols together.
+    # One fit per symbol; every horizon is read off the same forecast.
+    histories = fetch_historical_prices_many([stock["symbol"] for stock in portfolio], days=30)
+    with span("forecast"):
+        forecasts = dict(forecaster.forecast_many(histories.items(), max(periods_map.values())))
+
     for stock in portfolio:
         symbol = stock["symbol"]
         shares = stock["shares"]
         cost = stock["cost_price"]
-        # Fetch at least 30 days of history for Prophet
-        history = fetch_historical_prices(symbol, days=30)
+        history = histories[symbol]
         invested = shares * cost
         total_invested += invested
 
@@ -240,9 +275,15 @@ def predict_portfolio_returns(portfolio):
         if not history or len(history) < 10:
             print("  Not enough historical data for prediction (need at least 10 days).")
             continue
+        forecast = forecasts.get(symbol)
+        if forecast is None:
+            for label in periods_map:
+                print(f"  {label}: Prediction error: forecast failed or timed out")
+            continue
+        predicted_prices = horizon_prices(forecast, len(history), periods_map.values())
         for label, periods in periods_map.items():
             try:
-                predicted_price = predict_future_price(history, periods)
+                predicted_price = predicted_prices[periods]
                 predicted_value = shares * predicted_price
                 gain = predicted_value - invested
                 print(f"  {label}: Predicted price ${predicted_price:.2f}, Predicted gain/loss: ${gain:.2f}")
@@ -255,60 +296,93 @@ def predict_portfolio_returns(portfolio):
         overall_gain = total_predicted[label] - total_invested
         print(f"  {label}: Predicted overall gain/loss: ${overall_gain:.2f}")
 
-# 🔹 OpenAI Summary Generator
-def generate_ai_summary(portfolio, total_gain):
-    prompt = "Here's the user's portfolio:\n"
-    for stock in portfolio:
-        symbol = stock["symbol"]
-        shares = stock["shares"]
-        cost = stock["cost_price"]
-        current = fetch_current_price(symbol)
-        prompt += f"{symbol}: {shares} shares, bought at ${cost}, current price ${current}\n"
-
-    prompt += f"\nTotal portfolio gain/loss: ${total_gain:.2f}\n"
-    prompt += "Please write a concise summary of their portfolio performance and give 1 suggestion."
-
+# 🔹 Monte Carlo projections (correlated paths from 2 years of daily history, see montecarlo.py)
+def simulate_portfolio_returns(portfolio, paths=MC_PATHS):
+    print(f"\n🎲 Projected Returns (Monte Carlo, {paths:,} paths):")
+    with span("montecarlo"):
+        report = project(portfolio, paths)
+    if report['current_value'] is None:
+        print("  Not enough historical data for a simulation.")
+        return report
+    if report['unavailable']:
+        print(f"  ⚠️  No history for {', '.join(report['unavailable'])}; left out of the simulation.")
+    invested = report['simulated_invested']
+    print(f"  Invested: ${invested:.2f}, Current Value: ${report['current_value']:.2f}")
+    for label, horizon in report['horizons'].items():
+        p = horizon['percentiles']
+        print(f"  {label}: median ${p['50']:.2f} (gain/loss ${p['50'] - invested:.2f}), "
+              f"50% range ${p['25']:.2f}–${p['75']:.2f}, 90% range ${p['5']:.2f}–${p['95']:.2f}, "
+              f"chance of loss {horizon['prob_loss'] * 100:.0f}%")
+    return report
+
+# 🔹 OpenAI Summary Generator (cached on disk, see ai_summary.py)
+def generate_ai_summary(portfolio, valuation=None):
+    if valuation is None:
+        # Prices come from the quote cache, already warm after calculate_portfolio_value
+        valuation = value_portfolio(portfolio, fetch_current_prices([stock["symbol"] for stock in portfolio]))
+    print_ai_summary(get_summarizer().submit(valuation))
+
+def print_ai_summary(future):
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful investment advisor."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=100
-        )
-        summary = response.choices[0].message.content
-        print("\n💬 AI Summary (OpenAI):")
+        with span("ai_summary"):
+            summary, cached = future.result()
+        provider = get_summarizer().provider.name
+        label = "OpenAI" if provider == "openai" else provider
+        print(f"\n💬 AI Summary ({label}{', cached' if cached else ''}):")
         print(summary)
     except Exception as e:
         print(f"\n⚠️ OpenAI API error: {e}")
 
 # 🔹 Main Entry Point
 def main():
+    profile = metrics.start_profile()
+    with metrics.collect() as timings:
+        run_report()
+    if metrics.REPORT_TIMINGS:
+        print(f"\n⏱️ Timings: {timings.summary()}")
+    if profile is not None:
+        print(f"📝 Profile written to {metrics.dump_profile(profile, 'console')}")
+
+def run_report():
+    load_env()
     print("👤 Welcome to Portfolio Tracker!")
     username = input("Enter your name: ").strip().capitalize()
 
-    all_data = load_all_portfolios()
-    if username in all_data:
+    storage = get_storage()
+    if storage.has_user(username):
         print(f"🔄 Welcome back, {username}!")
-        portfolio = all_data[username]
+        portfolio = storage.get_portfolio(username)
         choice = input("Do you want to buy or sell stocks? (yes/no): ").strip().lower()
         if choice == 'yes':
             portfolio = update_portfolio(portfolio)
-            all_data[username] = portfolio
-            save_all_portfolios(all_data)
+            storage.save_portfolio(username, portfolio)
     else:
         print(f"👋 Hello {username}, let's set up your portfolio.")
         portfolio = get_user_portfolio()
-        all_data[username] = portfolio
-        save_all_portfolios(all_data)
+        storage.save_portfolio(username, portfolio)
 
     if portfolio:
-        calculate_portfolio_value(portfolio)
-        predict_portfolio_returns(portfolio)
+        # The valuation, risk report and projections then read quotes and closes from the caches
+        history_days = max(RISK_WINDOW_DAYS, MC_HISTORY_DAYS if PROJECTION_METHOD == "montecarlo" else calendar_days(30))
+        prefetch_market_data([stock["symbol"] for stock in portfolio] + [RISK_BENCHMARK], history_days)
+        valuation = calculate_portfolio_value(portfolio)
+        # The AI summary is generated while the forecasts run
+        summary = get_summarizer().submit(valuation)
+        show_risk_report(portfolio)
+        if PROJECTION_METHOD == "montecarlo":
+            simulate_portfolio_returns(portfolio)
+        else:
+            predict_portfolio_returns(portfolio)
+        print_ai_summary(summary)
     else:
         print("⚠️  No valid stock entries provided.")
 
 # Run script
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import sys
+    if "--batch" in sys.argv[1:]:
+        # Non-interactive revaluation of every portfolio (see batch_report.py)
+        from batch_report import main as batch_main
+        batch_main([a for a in sys.argv[1:] if a != "--batch"])
+    else:
+        main()
\ No newline at end of file
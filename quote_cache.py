@@ -0,0 +1,198 @@
+import contextlib
+import logging
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+
+QUOTE_CACHE_TTL = float(os.getenv("QUOTE_CACHE_TTL", "60"))
+QUOTE_CACHE_MAXSIZE = int(os.getenv("QUOTE_CACHE_MAXSIZE", "512"))
+
+
+# --- Upstream fetch ---
+# yfinance's "missing ticker" errors (unknown or delisted symbol), as opposed to network failures
+MISSING_TICKER_MARKERS = ("possibly delisted", "no price data found", "no timezone found")
+
+class _LogCapture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+@contextlib.contextmanager
+def missing_tickers():
+    """Collect, into the yielded set, the tickers yfinance reports as unknown or delisted while the block runs.
+
+    yfinance logs per-ticker download errors ("['A', 'B']: <error>") instead of raising; they tell
+    a typo from an outage, which yields an empty frame just the same.
+    """
+    missing = set()
+    capture = _LogCapture()
+    yf_logger = logging.getLogger("yfinance")
+    yf_logger.addHandler(capture)
+    try:
+        yield missing
+    finally:
+        yf_logger.removeHandler(capture)
+        for message in capture.messages:
+            tickers, sep, error = message.strip().partition("]: ")
+            if sep and tickers.startswith("[") and any(marker in error for marker in MISSING_TICKER_MARKERS):
+                missing.update(t.strip(" '\"") for t in tickers[1:].split(","))
+
+def download_quotes(symbols):
+    """Fetch the latest close for every symbol with a single multi-ticker download.
+
+    A symbol yfinance says it doesn't know maps to None; one whose download failed otherwise
+    (e.g. network down) is left out, so the cache treats it as unavailable rather than unknown.
+    """
+    import pandas as pd
+    import yfinance as yf
+    symbols = list(symbols)
+    with missing_tickers() as unknown, warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        data = yf.download(symbols, period="5d", progress=False, threads=True)
+    if data is None or data.empty:
+        return {symbol: None for symbol in symbols if symbol in unknown}
+    close = data["Close"]
+    if isinstance(close, pd.Series):
+        close = close.to_frame(symbols[0])
+    prices = {}
+    for symbol in symbols:
+        series = close[symbol].dropna() if symbol in close.columns else None
+        if series is not None and not series.empty:
+            prices[symbol] = float(series.iloc[-1])
+        elif symbol in unknown:
+            prices[symbol] = None
+    return prices
+
+
+def provider_quotes(symbols):
+    """Quotes from the configured market-data provider (MARKET_DATA_PROVIDER, see market_data.py)."""
+    from market_data import get_provider
+    return get_provider().quotes(symbols)
+
+
+# --- Cache ---
+class QuoteUnavailable(Exception):
+    """The quote source couldn't be reached for a symbol (as opposed to not knowing it)."""
+
+
+class QuoteCache:
+    """Latest-price cache with a TTL per entry and LRU eviction."""
+
+    def __init__(self, ttl=QUOTE_CACHE_TTL, maxsize=QUOTE_CACHE_MAXSIZE, fetcher=provider_quotes):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.fetcher = fetcher
+        self._entries = OrderedDict()  # symbol -> (price, fetched_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+
+    def _lookup(self, symbol, now):
+        entry = self._entries.get(symbol)
+        if entry is None or now - entry[1] > self.ttl:
+            return False, None
+        self._entries.move_to_end(symbol)
+        return True, entry[0]
+
+    def _store(self, symbol, price, now):
+        self._entries[symbol] = (price, now)
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, symbol, strict=False):
+        return self.get_many([symbol], strict).get(symbol.upper())
+
+    def get_many(self, symbols, strict=False):
+        """Return {symbol: price or None}, fetching all stale symbols in one upstream call.
+
+        None means unknown or unavailable; with `strict`, QuoteUnavailable is raised instead when
+        the fetch failed for any symbol (a fetcher leaves out the symbols it couldn't get).
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+        result = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for symbol in symbols:
+                found, price = self._lookup(symbol, now)
+                if found:
+                    self.hits += 1
+                    result[symbol] = price
+                else:
+                    self.misses += 1
+                    missing.append(symbol)
+        if missing:
+            try:
+                self.upstream_calls += 1
+                fetched = self.fetcher(missing)
+            except Exception:
+                # Don't cache failures of the whole request (e.g. network down)
+                fetched = None
+            now = time.monotonic()
+            failed = []
+            with self._lock:
+                for symbol in missing:
+                    if fetched is None or symbol not in fetched:
+                        failed.append(symbol)  # not cached, so the next call asks again
+                        result[symbol] = None
+                    else:
+                        self._store(symbol, fetched[symbol], now)
+                        result[symbol] = fetched[symbol]
+            if strict and failed:
+                raise QuoteUnavailable(f"No quote source reachable for {', '.join(failed)}")
+        return result
+
+    def peek(self, symbol):
+        """Cached price if fresh, without fetching (None when missing or expired)."""
+        with self._lock:
+            return self._lookup(symbol.upper(), time.monotonic())[1]
+
+    def stamp(self, symbols):
+        """Newest fetch time among `symbols` if all are cached and fresh, else None (never fetches).
+
+        Identifies the prices a page would be rendered with: it changes whenever one is refreshed.
+        """
+        now = time.monotonic()
+        stamp = 0.0
+        with self._lock:
+            for symbol in dict.fromkeys(s.upper() for s in symbols if s):
+                entry = self._entries.get(symbol)
+                if entry is None or now - entry[1] > self.ttl:
+                    return None
+                stamp = max(stamp, entry[1])
+        return stamp
+
+    def snapshot(self, symbols):
+        """(prices, stamp): get_many() plus the stamp of exactly those prices (None if not all cached)."""
+        prices = self.get_many(symbols)
+        with self._lock:
+            entries = [self._entries.get(symbol) for symbol in prices]
+        if any(entry is None for entry in entries):
+            return prices, None  # a failed fetch isn't cached, so there is nothing to identify it by
+        # Read back under the lock: another thread may have refreshed a symbol since get_many()
+        return {symbol: entry[0] for symbol, entry in zip(prices, entries)}, max((e[1] for e in entries), default=0.0)
+
+    def put(self, symbol, price):
+        with self._lock:
+            self._store(symbol.upper(), price, time.monotonic())
+
+    def invalidate(self, symbol=None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol.upper(), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared by the console app and the web app
+quote_cache = QuoteCache()
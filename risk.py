@@ -0,0 +1,168 @@
+"""Portfolio risk analytics on one date-aligned (days x symbols) price matrix.
+
+The matrix is assembled from the local history store after a single batched refresh of every
+symbol (plus the benchmark). Gaps are forward-filled, and a symbol is held flat at its first close
+before its history starts. Volatility, beta, correlation, historical VaR/CVaR and max drawdown are
+then computed for all symbols and the portfolio together in NumPy array passes.
+"""
+import os
+
+from history_store import from_day_number, history_store
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+RISK_WINDOW_DAYS = int(os.getenv("RISK_WINDOW_DAYS", "365"))
+RISK_BENCHMARK = os.getenv("RISK_BENCHMARK", "SPY")
+RISK_CONFIDENCE = float(os.getenv("RISK_CONFIDENCE", "0.95"))
+TRADING_DAYS = 252
+
+
+class PriceMatrix:
+    def __init__(self, days, symbols, prices):
+        self.days = days          # int64 day numbers, ascending
+        self.symbols = symbols
+        self.prices = prices      # float64 (days x symbols), NaN where a symbol has no close yet
+
+    def column(self, symbol):
+        return self.prices[:, self.symbols.index(symbol)]
+
+
+def price_matrix(symbols, days=RISK_WINDOW_DAYS, store=history_store):
+    """Aligned closes for `symbols` over the last `days` calendar days (one batched refresh)."""
+    symbols = list(dict.fromkeys(s.upper() for s in symbols if s))
+    store.refresh(symbols, days)
+    windows = [store.window(symbol, days) for symbol in symbols]
+    lengths = np.array([len(d) for d, _ in windows], dtype=np.int64)
+    if lengths.sum() == 0:
+        return PriceMatrix(np.empty(0, dtype=np.int64), symbols, np.empty((0, len(symbols))))
+    all_days = np.concatenate([d for d, _ in windows])
+    all_closes = np.concatenate([c for _, c in windows])
+    axis = np.unique(all_days)
+    prices = np.full((len(axis), len(symbols)), np.nan)
+    prices[np.searchsorted(axis, all_days), np.repeat(np.arange(len(symbols)), lengths)] = all_closes
+    return PriceMatrix(axis, symbols, prices)
+
+
+def fill_prices(prices):
+    """Forward-fill gaps, then back-fill each column's leading NaNs with its first close."""
+    n = len(prices)
+    valid = ~np.isnan(prices)
+    rows = np.where(valid, np.arange(n)[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = prices[rows, np.arange(prices.shape[1])]
+    first = valid.argmax(axis=0)
+    leading = np.arange(n)[:, None] < first
+    return np.where(leading, prices[first, np.arange(prices.shape[1])], filled)
+
+
+def max_drawdown(values):
+    """Largest peak-to-trough fall per column (a negative fraction, 0 if never below a peak)."""
+    peaks = np.maximum.accumulate(values, axis=0)
+    return (values / peaks - 1).min(axis=0)
+
+
+def tail_risk(returns, confidence):
+    """Historical VaR and CVaR per column, as positive loss fractions."""
+    cutoff = np.quantile(returns, 1 - confidence, axis=0)
+    tail = returns <= cutoff
+    cvar = (returns * tail).sum(axis=0) / np.maximum(tail.sum(axis=0), 1)
+    return -cutoff, -cvar
+
+
+def _number(value):
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else value
+
+def _numbers(array, decimals=4):
+    """Nested lists for JSON, rounded, with None for NaN/inf (one pass over the whole array)."""
+    array = np.round(array, decimals)
+    return np.where(np.isfinite(array), array, None).tolist()
+
+
+def compute_risk(matrix, shares, benchmark=None, confidence=RISK_CONFIDENCE):
+    """Risk metrics for holdings of `shares` (per matrix column) against an optional benchmark column."""
+    symbols = list(matrix.symbols)
+    has_data = ~np.isnan(matrix.prices).all(axis=0) if len(matrix.days) else np.zeros(len(symbols), dtype=bool)
+    bench_col = symbols.index(benchmark) if benchmark in symbols and has_data[symbols.index(benchmark)] else None
+    held = [i for i, symbol in enumerate(symbols) if has_data[i] and symbol in shares]
+    unavailable = [symbol for i, symbol in enumerate(symbols) if not has_data[i] and symbol in shares]
+    if not held or len(matrix.days) < 3:
+        return {'observations': int(len(matrix.days)), 'benchmark': None, 'confidence': confidence,
+                'portfolio': None, 'symbols': [], 'correlation': {'symbols': [], 'matrix': []},
+                'unavailable': unavailable or list(shares)}
+
+    prices = fill_prices(matrix.prices[:, held])
+    quantity = np.array([shares[symbols[i]] for i in held], dtype=np.float64)
+    values = prices * quantity
+    total = values.sum(axis=1)
+    weights = values[-1] / total[-1] if total[-1] else np.zeros(len(held))
+
+    # Daily simple returns: one column per holding plus the portfolio itself as the last column
+    series = np.column_stack([prices, total])
+    returns = series[1:] / series[:-1] - 1
+    volatility = returns.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+    var, cvar = tail_risk(returns, confidence)
+    drawdown = max_drawdown(series)
+
+    beta = np.full(returns.shape[1], np.nan)
+    if bench_col is not None:
+        bench = fill_prices(matrix.prices[:, [bench_col]])[:, 0]
+        market = bench[1:] / bench[:-1] - 1
+        centered = returns - returns.mean(axis=0)
+        market_centered = market - market.mean()
+        market_var = market_centered @ market_centered
+        if market_var:
+            beta = (market_centered @ centered) / market_var
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        correlation = np.corrcoef(returns[:, :-1], rowvar=False).reshape(len(held), len(held))
+
+    n = len(held)
+    portfolio_value = float(total[-1])
+    return {
+        'start': from_day_number(matrix.days[0]).isoformat(),
+        'end': from_day_number(matrix.days[-1]).isoformat(),
+        'observations': int(len(matrix.days)),
+        'benchmark': symbols[bench_col] if bench_col is not None else None,
+        'confidence': confidence,
+        'portfolio': {
+            'value': portfolio_value,
+            'volatility': _number(volatility[n]),
+            'beta': _number(beta[n]),
+            'var': _number(var[n]),
+            'cvar': _number(cvar[n]),
+            'var_amount': _number(var[n] * portfolio_value),
+            'cvar_amount': _number(cvar[n] * portfolio_value),
+            'max_drawdown': _number(drawdown[n]),
+        },
+        'symbols': [
+            {
+                'symbol': symbols[col],
+                'weight': _number(weights[i]),
+                'volatility': _number(volatility[i]),
+                'beta': _number(beta[i]),
+                'var': _number(var[i]),
+                'cvar': _number(cvar[i]),
+                'max_drawdown': _number(drawdown[i]),
+            }
+            for i, col in enumerate(held)
+        ],
+        'correlation': {
+            'symbols': [symbols[col] for col in held],
+            'matrix': _numbers(correlation),
+        },
+        'unavailable': unavailable,
+    }
+
+
+def risk_report(portfolio, days=RISK_WINDOW_DAYS, benchmark=RISK_BENCHMARK, confidence=RISK_CONFIDENCE, store=history_store):
+    """Risk metrics for a stored portfolio ({'symbol', 'shares', ...} list) over the last `days` days."""
+    shares = {}
+    for stock in portfolio:
+        shares[stock['symbol'].upper()] = shares.get(stock['symbol'].upper(), 0) + stock['shares']
+    benchmark = benchmark.upper() if benchmark else None
+    matrix = price_matrix(list(shares) + ([benchmark] if benchmark else []), days, store)
+    report = compute_risk(matrix, shares, benchmark, confidence)
+    report['window_days'] = days
+    return report
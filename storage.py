@@ -0,0 +1,673 @@
+"""Storage backends for portfolios and transactions.
+
+`PORTFOLIO_STORAGE=json` (default) keeps the original portfolios.json/transactions.json files.
+`PORTFOLIO_STORAGE=sqlite` keeps holdings and transactions in an SQLite database (WAL mode) and
+updates only the rows a trade touches. `PORTFOLIO_STORAGE=journal` is the append-only ledger in
+ledger.py. Import existing JSON data into SQLite once with:
+
+    python storage.py migrate
+"""
+import base64
+import bisect
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+PORTFOLIO_STORAGE = os.getenv("PORTFOLIO_STORAGE", "json")
+PORTFOLIO_FILE = "portfolios.json"
+TRANSACTION_FILE = "transactions.json"
+DATABASE_FILE = os.getenv("PORTFOLIO_DB", "portfolio.db")
+TRANSACTIONS_PAGE_SIZE = int(os.getenv("TRANSACTIONS_PAGE_SIZE", "50"))
+
+
+class TradeError(ValueError):
+    """A buy/sell that cannot be applied (e.g. selling more shares than held)."""
+
+
+# --- JSON files (original format) ---
+class JsonStorage:
+    def __init__(self, portfolio_file=PORTFOLIO_FILE, transaction_file=TRANSACTION_FILE):
+        self.portfolio_file = portfolio_file
+        self.transaction_file = transaction_file
+        self._lock = threading.RLock()
+        self._indexes = {}  # username -> TransactionIndex, valid for _indexed_version of the file
+        self._indexed_version = None
+        self._versions = {}  # username -> portfolio version, valid for _versioned_files
+        self._versioned_files = None
+
+    def _load(self, path):
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def _save(self, path, data):
+        with open(path, "w") as f:
+            json.dump(data, f, indent=4)
+
+    def load_all_portfolios(self):
+        return self._load(self.portfolio_file)
+
+    def save_all_portfolios(self, data):
+        with self._lock:
+            self._save(self.portfolio_file, data)
+
+    def load_all_transactions(self):
+        return self._load(self.transaction_file)
+
+    def save_all_transactions(self, data):
+        with self._lock:
+            self._save_transactions(data)
+
+    def _save_transactions(self, data, appended=None):
+        """Write transactions.json and extend the cached indexes with the new rows, without reading it back.
+
+        `appended` names the users the trade methods appended rows for, everyone else's being
+        untouched. Without it `data` may be any rewrite, so each cached index is checked, and one
+        whose rows are no longer a prefix of `data` is dropped and rebuilt on the next read.
+        """
+        current = self._indexed_version == _file_version(self.transaction_file)
+        self._save(self.transaction_file, data)
+        indexes = {}
+        for username, index in (self._indexes.items() if current else ()):
+            transactions = data.get(username, [])
+            n = len(index)
+            if appended is None and (len(transactions) < n or
+                                     any(index.rows[seq] != tx for seq, tx in enumerate(transactions[:n], 1))):
+                continue
+            for seq, tx in enumerate(transactions[n:], n + 1):
+                index.add(seq, dict(tx))
+            indexes[username] = index
+        self._indexes, self._indexed_version = indexes, _file_version(self.transaction_file)
+
+    def iter_portfolios(self):
+        """Yield (username, portfolio) for every user."""
+        yield from self.load_all_portfolios().items()
+
+    def has_user(self, username):
+        return username in self.load_all_portfolios()
+
+    def get_portfolio(self, username):
+        return self.load_all_portfolios().get(username, [])
+
+    def transaction_index(self, username):
+        """Per-user index, built on first use and extended by our own writes (see save_all_transactions).
+
+        If another process changes transactions.json, the indexes are built again from the file.
+        """
+        version = _file_version(self.transaction_file)
+        with self._lock:
+            if version != self._indexed_version:
+                self._indexes, self._indexed_version = {}, version
+            index = self._indexes.get(username)
+            if index is None:
+                index = self._indexes[username] = TransactionIndex.build(enumerate(self.get_transactions(username), 1))
+            return index
+
+    def transactions_page(self, username, limit=TRANSACTIONS_PAGE_SIZE, cursor=None, symbol=None, action=None):
+        return self.transaction_index(username).page(limit, cursor, symbol, action)
+
+    def get_transactions(self, username):
+        return self.load_all_transactions().get(username, [])
+
+    def iter_transactions(self, username=None):
+        """Yield (username, transaction) in recorded order, for one user or all (the file is read whole)."""
+        data = self.load_all_transactions()
+        users = [(username, data.get(username, []))] if username is not None else data.items()
+        for user, transactions in users:
+            for tx in transactions:
+                yield user, tx
+
+    def portfolio_version(self, username):
+        """Token that changes whenever the user's holdings or transactions change.
+
+        The files carry no per-user counter, so it is a digest of the user's data, computed once per
+        version of the two files: a trade by another user rewrites them but leaves this token alone.
+        """
+        files = tuple(_file_version(path) for path in (self.portfolio_file, self.transaction_file))
+        with self._lock:
+            if files != self._versioned_files:
+                self._versions, self._versioned_files = {}, files
+            version = self._versions.get(username)
+            if version is None:
+                data = json.dumps([self.get_portfolio(username), self.get_transactions(username)], sort_keys=True)
+                version = self._versions[username] = hashlib.sha1(data.encode()).hexdigest()[:16]
+            return version
+
+    def save_portfolio(self, username, portfolio):
+        with self._lock:
+            all_data = self.load_all_portfolios()
+            all_data[username] = portfolio
+            self.save_all_portfolios(all_data)
+
+    def buy(self, username, symbol, shares, price, when):
+        with self._lock:
+            all_data = self.load_all_portfolios()
+            all_transactions = self.load_all_transactions()
+            portfolio = all_data.setdefault(username, [])
+            apply_buy(portfolio, symbol, shares, price)
+            all_transactions.setdefault(username, []).append(_transaction('buy', symbol, shares, price, when))
+            self.save_all_portfolios(all_data)
+            self._save_transactions(all_transactions, appended={username})
+
+    def sell(self, username, symbol, shares, price, when):
+        with self._lock:
+            all_data = self.load_all_portfolios()
+            all_transactions = self.load_all_transactions()
+            portfolio = all_data.setdefault(username, [])
+            apply_sell(portfolio, symbol, shares)
+            all_transactions.setdefault(username, []).append(_transaction('sell', symbol, shares, price, when))
+            self.save_all_portfolios(all_data)
+            self._save_transactions(all_transactions, appended={username})
+
+    def remove_position(self, username, symbol, when):
+        with self._lock:
+            all_data = self.load_all_portfolios()
+            all_transactions = self.load_all_transactions()
+            portfolio = all_data.get(username, [])
+            removed = [stock for stock in portfolio if stock['symbol'] == symbol]
+            if not removed:
+                return
+            all_data[username] = [stock for stock in portfolio if stock['symbol'] != symbol]
+            all_transactions.setdefault(username, []).append(
+                _transaction('remove', symbol, removed[0]['shares'], None, when))
+            self.save_all_portfolios(all_data)
+            self._save_transactions(all_transactions, appended={username})
+
+    def record_trades(self, trades):
+        """Apply a batch of trades (see apply_trade) in order with one read and one write of each file.
+
+        Returns [(index, error)] for the trades rejected (e.g. selling more than held).
+        """
+        rejected = []
+        with self._lock:
+            all_data = self.load_all_portfolios()
+            all_transactions = self.load_all_transactions()
+            for i, trade in enumerate(trades):
+                username = trade['username']
+                portfolio = all_data.setdefault(username, []) if trade['action'] == 'buy' else all_data.get(username, [])
+                try:
+                    apply_trade(portfolio, trade)
+                except TradeError as e:
+                    rejected.append((i, str(e)))
+                    continue
+                all_transactions.setdefault(username, []).append(_trade_transaction(trade))
+            self.save_all_portfolios(all_data)
+            self._save_transactions(all_transactions, appended={trade['username'] for trade in trades})
+        return rejected
+
+
+# --- SQLite ---
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS holdings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    shares INTEGER NOT NULL,
+    cost_price REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_holdings_user_symbol ON holdings (username, symbol);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    action TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    shares INTEGER NOT NULL,
+    price REAL,
+    datetime TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_datetime ON transactions (username, datetime);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_symbol_datetime ON transactions (username, symbol, datetime);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS portfolio_versions (
+    username TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+class SqliteStorage:
+    def __init__(self, path=DATABASE_FILE):
+        self.path = path
+        self._local = threading.local()
+        self.db.executescript(SCHEMA)
+
+    @property
+    def db(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self):
+        return _WriteTransaction(self.db)
+
+    # Whole-dataset API (kept for existing callers)
+    def load_all_portfolios(self):
+        data = {row['username']: [] for row in self.db.execute("SELECT username FROM users")}
+        for row in self.db.execute("SELECT username, symbol, shares, cost_price FROM holdings ORDER BY id"):
+            data.setdefault(row['username'], []).append(_position(row))
+        return data
+
+    def save_all_portfolios(self, data):
+        for username, portfolio in data.items():
+            self.save_portfolio(username, portfolio)
+
+    def load_all_transactions(self):
+        data = {}
+        for row in self.db.execute("SELECT username, action, symbol, shares, price, datetime FROM transactions ORDER BY id"):
+            data.setdefault(row['username'], []).append(_transaction_row(row))
+        return data
+
+    def save_all_transactions(self, data):
+        # Transactions are append-only: only the rows past what is stored get inserted
+        with self._write() as db:
+            for username, transactions in data.items():
+                stored = db.execute("SELECT COUNT(*) FROM transactions WHERE username = ?", (username,)).fetchone()[0]
+                if transactions[stored:]:
+                    _insert_transactions(db, username, transactions[stored:])
+                    _bump_version(db, username)
+
+    def iter_portfolios(self):
+        """Yield (username, portfolio) one user at a time, straight off an index-ordered cursor."""
+        rows = self.db.execute(
+            "SELECT u.username, h.symbol, h.shares, h.cost_price FROM users u "
+            "LEFT JOIN holdings h ON h.username = u.username ORDER BY u.username, h.id")
+        current, portfolio = None, []
+        for row in rows:
+            if row['username'] != current:
+                if current is not None:
+                    yield current, portfolio
+                current, portfolio = row['username'], []
+            if row['symbol'] is not None:
+                portfolio.append(_position(row))
+        if current is not None:
+            yield current, portfolio
+
+    # Per-user API
+    def has_user(self, username):
+        return self.db.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+    def get_portfolio(self, username):
+        rows = self.db.execute(
+            "SELECT symbol, shares, cost_price FROM holdings WHERE username = ? ORDER BY id", (username,))
+        return [_position(row) for row in rows]
+
+    def get_transactions(self, username):
+        rows = self.db.execute(
+            "SELECT action, symbol, shares, price, datetime FROM transactions WHERE username = ? ORDER BY id",
+            (username,))
+        return [_transaction_row(row) for row in rows]
+
+    def transactions_page(self, username, limit=TRANSACTIONS_PAGE_SIZE, cursor=None, symbol=None, action=None):
+        sql = "SELECT id, action, symbol, shares, price, datetime FROM transactions WHERE username = ?"
+        params = [username]
+        if symbol:
+            sql += " AND symbol = ?"
+            params.append(symbol)
+        if action:
+            sql += " AND action = ?"
+            params.append(action)
+        if cursor:
+            sql += " AND (datetime, id) < (?, ?)"
+            params.extend(decode_cursor(cursor))
+        sql += " ORDER BY datetime DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        rows = self.db.execute(sql, params).fetchall()
+        return _page([((row['datetime'], row['id']), _transaction_row(row)) for row in rows], limit)
+
+    def iter_transactions(self, username=None):
+        """Yield (username, transaction) straight off a cursor, for one user or all."""
+        if username is not None:
+            rows = self.db.execute(
+                "SELECT username, action, symbol, shares, price, datetime FROM transactions WHERE username = ? ORDER BY id",
+                (username,))
+        else:
+            rows = self.db.execute("SELECT username, action, symbol, shares, price, datetime FROM transactions ORDER BY id")
+        for row in rows:
+            yield row['username'], _transaction_row(row)
+
+    def portfolio_version(self, username):
+        """Counter bumped in the same write transaction as every change to the user's holdings or transactions."""
+        row = self.db.execute("SELECT version FROM portfolio_versions WHERE username = ?", (username,)).fetchone()
+        return row['version'] if row is not None else 0
+
+    def save_portfolio(self, username, portfolio):
+        """Write only the positions that differ from what is stored."""
+        wanted = {stock['symbol']: stock for stock in portfolio}
+        with self._write() as db:
+            db.execute("INSERT OR IGNORE INTO users (username) VALUES (?)", (username,))
+            stored = {row['symbol']: row for row in db.execute(
+                "SELECT symbol, shares, cost_price FROM holdings WHERE username = ?", (username,))}
+            changed = False
+            for symbol in stored.keys() - wanted.keys():
+                db.execute("DELETE FROM holdings WHERE username = ? AND symbol = ?", (username, symbol))
+                changed = True
+            for symbol, stock in wanted.items():
+                row = stored.get(symbol)
+                if row is None:
+                    db.execute("INSERT INTO holdings (username, symbol, shares, cost_price) VALUES (?, ?, ?, ?)",
+                               (username, symbol, stock['shares'], stock['cost_price']))
+                    changed = True
+                elif (row['shares'], row['cost_price']) != (stock['shares'], stock['cost_price']):
+                    db.execute("UPDATE holdings SET shares = ?, cost_price = ? WHERE username = ? AND symbol = ?",
+                               (stock['shares'], stock['cost_price'], username, symbol))
+                    changed = True
+            if changed:
+                _bump_version(db, username)
+
+    def buy(self, username, symbol, shares, price, when):
+        with self._write() as db:
+            db.execute("INSERT OR IGNORE INTO users (username) VALUES (?)", (username,))
+            row = db.execute("SELECT shares, cost_price FROM holdings WHERE username = ? AND symbol = ?",
+                             (username, symbol)).fetchone()
+            if row is None:
+                db.execute("INSERT INTO holdings (username, symbol, shares, cost_price) VALUES (?, ?, ?, ?)",
+                           (username, symbol, shares, price))
+            else:
+                position = {'symbol': symbol, 'shares': row['shares'], 'cost_price': row['cost_price']}
+                apply_buy([position], symbol, shares, price)
+                db.execute("UPDATE holdings SET shares = ?, cost_price = ? WHERE username = ? AND symbol = ?",
+                           (position['shares'], position['cost_price'], username, symbol))
+            _insert_transactions(db, username, [_transaction('buy', symbol, shares, price, when)])
+            _bump_version(db, username)
+
+    def sell(self, username, symbol, shares, price, when):
+        with self._write() as db:
+            row = db.execute("SELECT shares, cost_price FROM holdings WHERE username = ? AND symbol = ?",
+                             (username, symbol)).fetchone()
+            position = [] if row is None else [{'symbol': symbol, 'shares': row['shares'], 'cost_price': row['cost_price']}]
+            apply_sell(position, symbol, shares)
+            if position:
+                db.execute("UPDATE holdings SET shares = ? WHERE username = ? AND symbol = ?",
+                           (position[0]['shares'], username, symbol))
+            else:
+                db.execute("DELETE FROM holdings WHERE username = ? AND symbol = ?", (username, symbol))
+            _insert_transactions(db, username, [_transaction('sell', symbol, shares, price, when)])
+            _bump_version(db, username)
+
+    def remove_position(self, username, symbol, when):
+        with self._write() as db:
+            row = db.execute("SELECT shares FROM holdings WHERE username = ? AND symbol = ?",
+                             (username, symbol)).fetchone()
+            if row is None:
+                return
+            db.execute("DELETE FROM holdings WHERE username = ? AND symbol = ?", (username, symbol))
+            _insert_transactions(db, username, [_transaction('remove', symbol, row['shares'], None, when)])
+            _bump_version(db, username)
+
+    def record_trades(self, trades):
+        """Apply a batch of trades in one write transaction; only the positions it touches are written.
+
+        Returns [(index, error)] for the trades rejected (e.g. selling more than held).
+        """
+        rejected = []
+        with self._write() as db:
+            held = {}       # username -> {symbol: position} for the users in this batch
+            touched = set()
+            accepted = []
+            for i, trade in enumerate(trades):
+                username, symbol = trade['username'], trade['symbol']
+                positions = held.get(username)
+                if positions is None:
+                    positions = held[username] = {row['symbol']: _position(row) for row in db.execute(
+                        "SELECT symbol, shares, cost_price FROM holdings WHERE username = ?", (username,))}
+                portfolio = [positions[symbol]] if symbol in positions else []
+                try:
+                    apply_trade(portfolio, trade)
+                except TradeError as e:
+                    rejected.append((i, str(e)))
+                    continue
+                if portfolio:
+                    positions[symbol] = portfolio[0]
+                else:
+                    positions.pop(symbol, None)
+                touched.add((username, symbol))
+                accepted.append(trade)
+            users = {trade['username'] for trade in accepted}
+            db.executemany("INSERT OR IGNORE INTO users (username) VALUES (?)", [(u,) for u in users])
+            for username, symbol in touched:
+                stock = held[username].get(symbol)
+                if stock is None:
+                    db.execute("DELETE FROM holdings WHERE username = ? AND symbol = ?", (username, symbol))
+                else:
+                    db.execute(
+                        "INSERT INTO holdings (username, symbol, shares, cost_price) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (username, symbol) DO UPDATE SET shares = excluded.shares, cost_price = excluded.cost_price",
+                        (username, symbol, stock['shares'], stock['cost_price']))
+            db.executemany(
+                "INSERT INTO transactions (username, action, symbol, shares, price, datetime) VALUES (?, ?, ?, ?, ?, ?)",
+                [(t['username'], t['action'], t['symbol'], t['shares'], t['price'], t['datetime']) for t in accepted])
+            for username in users:
+                _bump_version(db, username)
+        return rejected
+
+    # Migration
+    def migrate_from_json(self, source=None, force=False):
+        """One-shot import of the JSON files; returns (users, holdings, transactions) imported."""
+        source = source or JsonStorage()
+        with self._write() as db:
+            done = db.execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone()
+            if done and not force:
+                return None
+            db.execute("DELETE FROM holdings")
+            db.execute("DELETE FROM transactions")
+            db.execute("DELETE FROM users")
+            portfolios = source.load_all_portfolios()
+            all_transactions = source.load_all_transactions()
+            holdings = 0
+            for username, portfolio in portfolios.items():
+                db.execute("INSERT OR IGNORE INTO users (username) VALUES (?)", (username,))
+                for stock in portfolio:
+                    db.execute(
+                        "INSERT INTO holdings (username, symbol, shares, cost_price) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (username, symbol) DO UPDATE SET shares = excluded.shares, cost_price = excluded.cost_price",
+                        (username, stock['symbol'], stock['shares'], stock['cost_price']))
+                    holdings += 1
+            transactions = 0
+            for username, rows in all_transactions.items():
+                _insert_transactions(db, username, rows)
+                transactions += len(rows)
+            # Versions are bumped, not reset, so a re-import never reuses a version seen before
+            db.execute("UPDATE portfolio_versions SET version = version + 1")
+            db.executemany("INSERT OR IGNORE INTO portfolio_versions (username, version) VALUES (?, 1)",
+                           [(username,) for username in set(portfolios) | set(all_transactions)])
+            users = len(set(portfolios) | set(all_transactions))
+            db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                       (json.dumps({'users': users, 'holdings': holdings, 'transactions': transactions}),))
+        return users, holdings, transactions
+
+
+class _WriteTransaction:
+    """`with` block running as one BEGIN IMMEDIATE transaction, so concurrent writers serialize."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# --- Position rules shared by every backend ---
+def apply_buy(portfolio, symbol, shares, price):
+    """Add shares to the position, keeping an average cost price."""
+    for stock in portfolio:
+        if stock['symbol'] == symbol:
+            total_shares = stock['shares'] + shares
+            stock['cost_price'] = (
+                (stock['cost_price'] * stock['shares'] + price * shares) / total_shares
+            )
+            stock['shares'] = total_shares
+            return stock
+    stock = {'symbol': symbol, 'shares': shares, 'cost_price': price}
+    portfolio.append(stock)
+    return stock
+
+def apply_sell(portfolio, symbol, shares):
+    """Remove shares from the position (dropping it at zero); raises TradeError if not possible."""
+    for stock in portfolio:
+        if stock['symbol'] == symbol:
+            if shares > stock['shares']:
+                raise TradeError(f"You only have {stock['shares']} shares of {symbol}.")
+            stock['shares'] -= shares
+            if stock['shares'] == 0:
+                portfolio.remove(stock)
+            return stock
+    raise TradeError(f"You do not own any shares of {symbol}.")
+
+def apply_trade(portfolio, trade):
+    """Apply one {'username', 'action': 'buy'|'sell', 'symbol', 'shares', 'price', 'datetime'} trade."""
+    if trade['action'] == 'buy':
+        return apply_buy(portfolio, trade['symbol'], trade['shares'], trade['price'])
+    return apply_sell(portfolio, trade['symbol'], trade['shares'])
+
+def _file_version(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _transaction(action, symbol, shares, price, when):
+    return {'action': action, 'symbol': symbol, 'shares': shares, 'price': price, 'datetime': when}
+
+def _trade_transaction(trade):
+    return _transaction(trade['action'], trade['symbol'], trade['shares'], trade['price'], trade['datetime'])
+
+def _position(row):
+    return {'symbol': row['symbol'], 'shares': row['shares'], 'cost_price': row['cost_price']}
+
+def _transaction_row(row):
+    return _transaction(row['action'], row['symbol'], row['shares'], row['price'], row['datetime'])
+
+def _bump_version(db, username):
+    db.execute("INSERT INTO portfolio_versions (username, version) VALUES (?, 1) "
+               "ON CONFLICT (username) DO UPDATE SET version = version + 1", (username,))
+
+def _insert_transactions(db, username, transactions):
+    db.executemany(
+        "INSERT INTO transactions (username, action, symbol, shares, price, datetime) VALUES (?, ?, ?, ?, ?, ?)",
+        [(username, tx['action'], tx['symbol'], tx['shares'], tx['price'], tx['datetime']) for tx in transactions])
+
+
+# --- Transaction pages (newest first, keyset cursor on (datetime, seq)) ---
+def encode_cursor(when, seq):
+    return base64.urlsafe_b64encode(json.dumps([when, seq]).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """(datetime, seq) from a cursor; raises ValueError for a malformed one."""
+    try:
+        when, seq = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor '{cursor}'") from None
+    if not isinstance(when, str) or not isinstance(seq, int):
+        raise ValueError(f"Invalid cursor '{cursor}'")
+    return when, seq
+
+def _page(items, limit):
+    """Page dict from up to limit + 1 ((datetime, seq), transaction) pairs, newest first."""
+    more = len(items) > limit
+    items = items[:limit]
+    return {
+        'transactions': [dict(tx) for _, tx in items],
+        'next_cursor': encode_cursor(*items[-1][0]) if more and items else None,
+    }
+
+class TransactionIndex:
+    """One user's transactions as (datetime, seq) keys in sorted lists, overall and per symbol.
+
+    A page is a bisect to the cursor plus a walk over at most the page (the action filter may skip
+    rows), so reading it doesn't touch the rest of the history.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.by_symbol = {}
+        self.rows = {}  # seq -> transaction
+
+    @classmethod
+    def build(cls, items):
+        """From (seq, transaction) pairs in any order."""
+        index = cls()
+        for seq, tx in items:
+            index.rows[seq] = tx
+            key = (tx.get('datetime') or '', seq)
+            index.keys.append(key)
+            index.by_symbol.setdefault(tx['symbol'], []).append(key)
+        index.keys.sort()
+        for keys in index.by_symbol.values():
+            keys.sort()
+        return index
+
+    def add(self, seq, tx):
+        key = (tx.get('datetime') or '', seq)
+        self.rows[seq] = tx
+        bisect.insort(self.keys, key)
+        bisect.insort(self.by_symbol.setdefault(tx['symbol'], []), key)
+
+    def __contains__(self, seq):
+        return seq in self.rows
+
+    def __len__(self):
+        return len(self.keys)
+
+    def page(self, limit=TRANSACTIONS_PAGE_SIZE, cursor=None, symbol=None, action=None):
+        keys = self.keys if not symbol else self.by_symbol.get(symbol, [])
+        i = len(keys) if not cursor else bisect.bisect_left(keys, decode_cursor(cursor))
+        items = []
+        while i > 0 and len(items) <= limit:
+            i -= 1
+            tx = self.rows[keys[i][1]]
+            if not action or tx['action'] == action:
+                items.append((keys[i], tx))
+        return _page(items, limit)
+
+
+
+def _journal_storage():
+    from ledger import JournalStorage
+    return JournalStorage()
+
+BACKENDS = {
+    "json": JsonStorage,
+    "sqlite": SqliteStorage,
+    "journal": _journal_storage,
+}
+
+_storage = None
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        if PORTFOLIO_STORAGE not in BACKENDS:
+            raise ValueError(f"Unknown PORTFOLIO_STORAGE '{PORTFOLIO_STORAGE}' (choose from {', '.join(BACKENDS)})")
+        _storage = BACKENDS[PORTFOLIO_STORAGE]()
+    return _storage
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python storage.py migrate [--force]")
+        sys.exit(1)
+    result = SqliteStorage().migrate_from_json(force="--force" in sys.argv)
+    if result is None:
+        print(f"⚠️  {DATABASE_FILE} was already migrated (use --force to re-import).")
+    else:
+        print(f"✅ Imported {result[0]} users, {result[1]} holdings and {result[2]} transactions into {DATABASE_FILE}.")
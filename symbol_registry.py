@@ -0,0 +1,102 @@
+"""Ticker validation without a network round trip per attempt.
+
+Valid tickers are remembered with their last quote; tickers the quote source does not know are
+remembered as invalid for SYMBOL_INVALID_TTL seconds, so retrying a typo doesn't hit the network.
+A ticker that couldn't be checked (quote source unreachable) is not remembered either way.
+Tickers listed in SYMBOL_LIST_FILE (one per line, extra comma-separated columns and `#` comments are
+ignored) are valid from the start and are never checked upstream.
+"""
+import os
+import threading
+import time
+
+from quote_cache import QuoteUnavailable, quote_cache
+
+SYMBOL_LIST_FILE = os.getenv("SYMBOL_LIST_FILE", "tickers.txt")
+SYMBOL_INVALID_TTL = float(os.getenv("SYMBOL_INVALID_TTL", "300"))
+
+
+def load_symbol_list(path):
+    """Set of tickers from a local list file (missing file -> empty set)."""
+    if not path or not os.path.exists(path):
+        return set()
+    symbols = set()
+    with open(path, "r") as f:
+        for line in f:
+            symbol = line.split("#", 1)[0].split(",", 1)[0].strip().upper()
+            if symbol and symbol != "SYMBOL":
+                symbols.add(symbol)
+    return symbols
+
+
+class SymbolRegistry:
+    def __init__(self, quotes=quote_cache, symbol_file=SYMBOL_LIST_FILE, invalid_ttl=SYMBOL_INVALID_TTL):
+        self.quotes = quotes
+        self.invalid_ttl = invalid_ttl
+        self._valid = dict.fromkeys(load_symbol_list(symbol_file))  # symbol -> last quote (None if not seen)
+        self._invalid = {}  # symbol -> expiry (monotonic)
+        self._lock = threading.Lock()
+        self.upstream_checks = 0
+
+    def check(self, symbol):
+        """(valid, quote) for a ticker; `quote` is the price seen while validating, if any."""
+        symbol = symbol.strip().upper()
+        if not symbol:
+            return False, None
+        now = time.monotonic()
+        with self._lock:
+            expiry = self._invalid.get(symbol)
+            if expiry is not None:
+                if now < expiry:
+                    return False, None
+                del self._invalid[symbol]
+            if symbol in self._valid:
+                quote = self.quotes.peek(symbol)
+                if quote is None:
+                    quote = self._valid[symbol]
+                else:
+                    self._valid[symbol] = quote
+                return True, quote
+        self.upstream_checks += 1
+        try:
+            quote = self.quotes.get(symbol, strict=True)
+        except QuoteUnavailable:
+            return False, None  # couldn't check: not remembered as invalid, so the next attempt asks again
+        with self._lock:
+            if quote is None:
+                self._invalid[symbol] = time.monotonic() + self.invalid_ttl
+            else:
+                self._valid[symbol] = quote
+        return quote is not None, quote
+
+    def is_valid(self, symbol):
+        return self.check(symbol)[0]
+
+    def quote(self, symbol):
+        """Price for a trade record: the validation quote if known, otherwise a (cached) fetch."""
+        valid, quote = self.check(symbol)
+        if valid and quote is None:
+            quote = self.quotes.get(symbol)
+            if quote is not None:
+                with self._lock:
+                    self._valid[symbol.strip().upper()] = quote
+        return quote
+
+    def add(self, symbol, quote=None):
+        with self._lock:
+            symbol = symbol.strip().upper()
+            self._invalid.pop(symbol, None)
+            self._valid[symbol] = quote
+
+    def forget(self, symbol):
+        with self._lock:
+            symbol = symbol.strip().upper()
+            self._valid.pop(symbol, None)
+            self._invalid.pop(symbol, None)
+
+    def __contains__(self, symbol):
+        return symbol.strip().upper() in self._valid
+
+
+# Shared by the console app and the web app
+symbol_registry = SymbolRegistry()
@@ -0,0 +1,101 @@
+"""Vectorized portfolio valuation.
+
+`Holdings` keeps positions as parallel NumPy arrays (symbol index, shares, cost, price) and
+`value_holdings` computes per-position and total P&L, weights and top/bottom movers in single
+array passes, so books with thousands of positions cost no more Python-level work than small ones.
+"""
+from lazy_imports import lazy_import
+
+# NumPy loads on first use, so importing the apps stays cheap (see benchmarks/bench_import.py)
+np = lazy_import("numpy")
+
+
+class Holdings:
+    def __init__(self, symbols, index, shares, cost, price):
+        self.symbols = symbols          # symbol table; `index` points into it
+        self.index = index              # int64 per position
+        self.shares = shares            # float64 per position
+        self.cost = cost                # float64 per position (average cost price)
+        self.price = price              # float64 per position, NaN when no quote
+
+    @classmethod
+    def from_portfolio(cls, portfolio, prices, symbols=None):
+        """Build from the stored list of {'symbol', 'shares', 'cost_price'} and a {symbol: price} map."""
+        symbols = list(symbols) if symbols is not None else list(dict.fromkeys(s['symbol'] for s in portfolio))
+        position = {symbol: i for i, symbol in enumerate(symbols)}
+        n = len(portfolio)
+        index = np.fromiter((position[s['symbol']] for s in portfolio), dtype=np.int64, count=n)
+        shares = np.fromiter((s['shares'] for s in portfolio), dtype=np.float64, count=n)
+        cost = np.fromiter((s['cost_price'] for s in portfolio), dtype=np.float64, count=n)
+        table = np.array([np.nan if prices.get(symbol) is None else prices[symbol] for symbol in symbols], dtype=np.float64)
+        return cls(symbols, index, shares, cost, table[index] if n else np.empty(0))
+
+    def __len__(self):
+        return len(self.index)
+
+    def symbol(self, i):
+        return self.symbols[self.index[i]]
+
+
+class Valuation:
+    def __init__(self, holdings, invested, current_value, gain, priced, weights):
+        self.holdings = holdings
+        self.invested = invested
+        self.current_value = current_value  # 0 where there is no quote
+        self.gain = gain                    # 0 where there is no quote
+        self.priced = priced
+        self.weights = weights              # share of total current value
+        self.total_invested = float(invested.sum())
+        self.priced_invested = float(invested[priced].sum())
+        self.total_current = float(current_value.sum())
+        self.overall_gain = self.total_current - self.total_invested
+        self.priced_gain = self.total_current - self.priced_invested
+
+    def _movers(self, k, largest):
+        candidates = np.flatnonzero(self.priced)
+        if candidates.size == 0:
+            return []
+        k = min(k, candidates.size)
+        gains = self.gain[candidates] if largest else -self.gain[candidates]
+        top = candidates[np.argpartition(-gains, k - 1)[:k]]
+        top = top[np.argsort(-self.gain[top] if largest else self.gain[top], kind="stable")]
+        return [{'symbol': self.holdings.symbol(i), 'gain': float(self.gain[i])} for i in top]
+
+    def top_movers(self, k=1):
+        return self._movers(k, largest=True)
+
+    def bottom_movers(self, k=1):
+        return self._movers(k, largest=False)
+
+    def rows(self):
+        """Per-position dicts in the format of the portfolio summary table."""
+        h = self.holdings
+        prices = np.where(self.priced, h.price, 0.0)
+        return [
+            {
+                'symbol': h.symbols[i],
+                'shares': int(shares) if shares.is_integer() else shares,
+                'cost': cost,
+                'current': price if priced else None,
+                'invested': invested,
+                'current_value': value,
+                'gain': gain,
+                'weight': weight,
+            }
+            for i, shares, cost, price, priced, invested, value, gain, weight in zip(
+                h.index.tolist(), h.shares.tolist(), h.cost.tolist(), prices.tolist(), self.priced.tolist(),
+                self.invested.tolist(), self.current_value.tolist(), self.gain.tolist(), self.weights.tolist())
+        ]
+
+
+def value_holdings(holdings):
+    priced = ~np.isnan(holdings.price)
+    invested = holdings.shares * holdings.cost
+    current_value = np.where(priced, holdings.shares * np.nan_to_num(holdings.price), 0.0)
+    gain = np.where(priced, current_value - invested, 0.0)
+    total = current_value.sum()
+    weights = current_value / total if total else np.zeros_like(current_value)
+    return Valuation(holdings, invested, current_value, gain, priced, weights)
+
+def value_portfolio(portfolio, prices):
+    return value_holdings(Holdings.from_portfolio(portfolio, prices))
@@ -1,54 +1,130 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-import os
-import json
-import yfinance as yf
-import plotly
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, g, session, stream_with_context
+from markupsafe import Markup
 import datetime
-import plotly.graph_objs as go
-import plotly.io as pio
+import json
+import os
+import re
+import threading
+import time
+from quote_cache import quote_cache
+from symbol_registry import symbol_registry
+from history_store import calendar_days, history_store
+import forecasting
+from forecasting import FORECASTERS, FORECAST_BACKEND, FORECAST_PREWARM, forecast_many, prewarm
+from storage import TRANSACTIONS_PAGE_SIZE, TradeError, get_storage
+from jobs import job_queue
+from live_quotes import get_hub
+from charts import price_forecast_figure
+from valuation import value_portfolio
+from risk import RISK_WINDOW_DAYS, risk_report
+from fragment_cache import etag_for, fragment_cache
+from bulk_io import Export
+import metrics
+from metrics import span
 
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'  # Change this in production
 
-PORTFOLIO_FILE = "portfolios.json"
-TRANSACTION_FILE = "transactions.json"
-
 # --- Helper functions (reuse your logic) ---
 def fetch_current_price(symbol):
-    try:
-        stock = yf.Ticker(symbol)
-        price = stock.history(period="1d")['Close'].iloc[-1]
-        return float(price)
-    except Exception:
-        return None
+    with span("quotes"):
+        return quote_cache.get(symbol)
+
+def fetch_current_prices(symbols):
+    with span("quotes"):
+        return quote_cache.get_many(symbols)
 
 def fetch_historical_prices(symbol, days=5):
-    try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=f"{days}d")
-        return [float(p) for p in hist["Close"].tolist()]
-    except Exception:
-        return []
+    with span("history"):
+        history_store.refresh([symbol], calendar_days(days))
+        return history_store.recent_closes(symbol.upper(), days).tolist()
+
+def fetch_historical_prices_many(symbols, days=5):
+    with span("history"):
+        history_store.refresh(symbols, calendar_days(days))
+        return {symbol: history_store.recent_closes(symbol.upper(), days).tolist() for symbol in symbols}
+
+def predict_future_price(prices, periods, symbol=None, backend=None):
+    with span("forecast"):
+        return forecasting.predict_future_price(prices, periods, symbol, backend)
 
 def load_all_portfolios():
-    if not os.path.exists(PORTFOLIO_FILE):
-        return {}
-    with open(PORTFOLIO_FILE, "r") as f:
-        return json.load(f)
+    with span("storage"):
+        return get_storage().load_all_portfolios()
 
 def save_all_portfolios(data):
-    with open(PORTFOLIO_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    with span("storage"):
+        get_storage().save_all_portfolios(data)
 
 def load_all_transactions():
-    if not os.path.exists(TRANSACTION_FILE):
-        return {}
-    with open(TRANSACTION_FILE, "r") as f:
-        return json.load(f)
+    with span("storage"):
+        return get_storage().load_all_transactions()
 
 def save_all_transactions(data):
-    with open(TRANSACTION_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    with span("storage"):
+        get_storage().save_all_transactions(data)
+
+# --- Metrics (Server-Timing per response, Prometheus text on /metrics) ---
+request_seconds = metrics.registry.histogram("portfolio_request_seconds", "Request latency by endpoint.", ("endpoint",))
+requests_total = metrics.registry.counter("portfolio_requests_total", "Requests by endpoint and status.", ("endpoint", "status"))
+forecast_fits = metrics.registry.counter("portfolio_forecast_fits_total", "Symbols forecast by background jobs.", ("backend",))
+fits_per_job = metrics.registry.histogram("portfolio_forecast_fits_per_job", "Symbols forecast per forecast job (one job per page view with new holdings).", buckets=(1, 2, 5, 10, 20, 50, 100, 250))
+metrics.registry.callback("portfolio_quote_cache_hits_total", "Quote cache hits.", lambda: quote_cache.hits)
+metrics.registry.callback("portfolio_quote_cache_misses_total", "Quote cache misses.", lambda: quote_cache.misses)
+metrics.registry.callback("portfolio_upstream_calls_total", "Calls to the market data source.", lambda: {
+    ('quotes',): quote_cache.upstream_calls,
+    ('history',): history_store.upstream_calls,
+    ('symbols',): symbol_registry.upstream_checks,
+}, ("source",))
+metrics.registry.callback("portfolio_live_subscribers", "Open live quote streams.", lambda: get_hub().subscribers(), type="gauge")
+metrics.registry.callback("portfolio_fragment_cache_hits_total", "Page fragments served from the fragment cache.", lambda: fragment_cache.hits)
+metrics.registry.callback("portfolio_fragment_cache_misses_total", "Page fragments rendered.", lambda: fragment_cache.misses)
+metrics.registry.callback("portfolio_live_polls_total", "Polls made by the shared live quote poller.", lambda: get_hub().polls)
+
+# --- Prophet prewarm (on the first request, so importing the module starts no threads or processes) ---
+_prewarm_lock = threading.Lock()
+_prewarm_started = False
+
+@app.before_request
+def start_prewarm():
+    # Import Prophet in the background so the first forecast request doesn't pay for it
+    global _prewarm_started
+    if _prewarm_started or not FORECAST_PREWARM:
+        return
+    with _prewarm_lock:
+        if not _prewarm_started:
+            _prewarm_started = True
+            prewarm()
+
+@app.before_request
+def start_request_timing():
+    metrics.start()
+    g.profile = metrics.start_profile()
+
+@app.after_request
+def add_server_timing(response):
+    collector = metrics.stop()
+    endpoint = request.endpoint or 'unknown'
+    if collector is not None:
+        response.headers['Server-Timing'] = collector.server_timing()
+        request_seconds.observe(time.perf_counter() - collector.started, endpoint)
+    requests_total.inc(endpoint, response.status_code)
+    profile = g.pop('profile', None)
+    if profile is not None:
+        app.logger.info("profile for %s written to %s", request.path, metrics.dump_profile(profile, endpoint))
+    return response
+
+@app.teardown_request
+def stop_request_timing(exc):
+    # after_request is skipped on unhandled errors; don't leak the collector or a running profiler
+    metrics.stop()
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.disable()
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 # --- Flask routes ---
 @app.route('/', methods=['GET', 'POST'])
@@ -60,11 +136,13 @@ def index():
 
 @app.route('/portfolio/<username>', methods=['GET', 'POST'])
 def portfolio(username):
-    all_data = load_all_portfolios()
-    all_transactions = load_all_transactions()
-    portfolio = all_data.get(username, [])
-    transactions = all_transactions.get(username, [])
+    storage = get_storage()
     message = None
+    model = request.args.get('model')
+    if request.method == 'GET':
+        not_modified = check_not_modified(storage, username, model)
+        if not_modified is not None:
+            return not_modified
     if request.method == 'POST':
         action = request.form.get('action')
         symbol = request.form.get('symbol', '').upper()
@@ -73,174 +151,290 @@ def portfolio(username):
         idx = request.form.get('idx')
         now = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         if action == 'add':
-            if fetch_current_price(symbol) is None:
+            with span("symbols"):
+                valid, quote = symbol_registry.check(symbol)
+            if not valid:
                 flash(f"{symbol} not found or unavailable.", 'danger')
             else:
                 try:
                     shares = int(shares)
-                    cost_price = float(cost_price)
-                    found = False
-                    for stock in portfolio:
-                        if stock['symbol'] == symbol:
-                            total_shares = stock['shares'] + shares
-                            stock['cost_price'] = (
-                                (stock['cost_price'] * stock['shares'] + cost_price * shares) / total_shares
-                            )
-                            stock['shares'] = total_shares
-                            found = True
-                            break
-                    if not found:
-                        portfolio.append({
-                            'symbol': symbol,
-                            'shares': shares,
-                            'cost_price': cost_price
-                        })
-                    transactions.append({
-                        'action': 'buy',
-                        'symbol': symbol,
-                        'shares': shares,
-                        'price': cost_price,
-                        'datetime': now
-                    })
-                    all_data[username] = portfolio
-                    all_transactions[username] = transactions
-                    save_all_portfolios(all_data)
-                    save_all_transactions(all_transactions)
+                    # A blank price buys at the quote seen while validating the symbol
+                    cost_price = float(cost_price) if cost_price else float(symbol_registry.quote(symbol))
+                    with span("storage"):
+                        storage.buy(username, symbol, shares, cost_price, now)
                     flash(f"Bought {shares} shares of {symbol}.", 'success')
                 except Exception:
                     flash("Invalid input.", 'danger')
         elif action == 'sell':
             try:
                 shares = int(shares)
-                found = False
-                for stock in portfolio:
-                    if stock['symbol'] == symbol:
-                        found = True
-                        if shares > stock['shares']:
-                            flash(f"You only have {stock['shares']} shares of {symbol}.", 'danger')
-                            break
-                        stock['shares'] -= shares
-                        transactions.append({
-                            'action': 'sell',
-                            'symbol': symbol,
-                            'shares': shares,
-                            'price': fetch_current_price(symbol),
-                            'datetime': now
-                        })
-                        flash(f"Sold {shares} shares of {symbol}.", 'success')
-                        if stock['shares'] == 0:
-                            portfolio.remove(stock)
-                        break
-                if not found:
-                    flash(f"You do not own any shares of {symbol}.", 'danger')
-                all_data[username] = portfolio
-                all_transactions[username] = transactions
-                save_all_portfolios(all_data)
-                save_all_transactions(all_transactions)
+                with span("quotes"):
+                    price = symbol_registry.quote(symbol)
+                with span("storage"):
+                    storage.sell(username, symbol, shares, price, now)
+                flash(f"Sold {shares} shares of {symbol}.", 'success')
+            except TradeError as e:
+                flash(str(e), 'danger')
             except Exception:
                 flash("Invalid input.", 'danger')
         elif action == 'delete':
             idx = int(idx)
-            if 0 <= idx < len(portfolio):
-                removed = portfolio.pop(idx)
-                all_data[username] = portfolio
-                save_all_portfolios(all_data)
+            with span("storage"):
+                portfolio = storage.get_portfolio(username)
+                removed = portfolio[idx] if 0 <= idx < len(portfolio) else None
+                if removed is not None:
+                    storage.remove_position(username, removed['symbol'], now)
+            if removed is not None:
                 flash(f"Removed {removed['symbol']} from portfolio.", 'info')
-    # Calculate summary
-    summary = []
-    total_invested = 0
-    total_current = 0
-    periods_map = {
-        "1 year": 1,
-        "3 years": 2,
-        "5 years": 3
+    with span("storage"):
+        # Version first: a trade landing in between then only makes this render newer than its key
+        version = storage.portfolio_version(username)
+        portfolio = storage.get_portfolio(username)
+    symbols = fragment_cache.put(('symbols', username, version), [stock['symbol'] for stock in portfolio])
+    # Calculate summary (quotes only; forecasts and charts are computed in the background).
+    # The job starts first so its history download runs alongside the quote fetch.
+    start_forecast_job(username, portfolio, model)
+    with span("quotes"):
+        prices, stamp = quote_cache.snapshot(symbols)
+    fragments = {
+        'holdings': fragment_cache.get_or_render(
+            ('holdings', username, version, stamp) if stamp is not None else None,
+            lambda: render_holdings(portfolio, prices)),
+        'transactions': fragment_cache.get_or_render(
+            ('transactions', username, version), lambda: render_transactions(storage, username)),
+        'charts': fragment_cache.get_or_render(('charts', username, version), lambda: render_charts(portfolio)),
     }
-    future_predictions = []
-    plotly_plots = []
-    for stock in portfolio:
-        symbol = stock['symbol']
-        shares = stock['shares']
-        cost = stock['cost_price']
-        current = fetch_current_price(symbol)
-        invested = shares * cost
-        current_value = shares * current if current else 0
-        gain = current_value - invested if current else 0
-        # Fetch more history for Prophet
-        history = fetch_historical_prices(symbol, days=30)
-        predictions = {}
-        future_prices = []
-        if history and len(history) >= 10:
-            try:
-                from prophet import Prophet
-                import pandas as pd
-                # Prepare data for Prophet
-                df = pd.DataFrame({
-                    'ds': pd.date_range(end=pd.Timestamp.today(), periods=len(history)),
-                    'y': history
-                })
-                model = Prophet(daily_seasonality=False, yearly_seasonality=False, weekly_seasonality=False)
-                model.fit(df)
-                # Forecast for 3 days
-                future = model.make_future_dataframe(periods=3, freq='D')
-                forecast = model.predict(future)
-                # Plotly plot: history + forecast
-                fig = go.Figure()
-                fig.add_trace(go.Scatter(x=df['ds'], y=df['y'], mode='lines+markers', name='History'))
-                fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat'], mode='lines', name='Forecast'))
-                fig.update_layout(title=f"{symbol} Price Prediction (History + 3d Forecast)", xaxis_title="Date", yaxis_title="Price ($)", template="plotly_white", height=350)
-                plot_html = pio.to_html(fig, full_html=False)
-                plotly_plots.append({'symbol': symbol, 'plot_html': plot_html})
-                # For table predictions: 1 day, 2 days, 3 days
-                days_map = {"1 day": 1, "2 days": 2, "3 days": 3}
-                for label, days_ahead in days_map.items():
-                    try:
-                        predicted_price = forecast.iloc[len(history)+days_ahead-1]['yhat']
-                        predicted_value = shares * predicted_price
-                        predictions[label] = {
-                            'predicted_price': predicted_price,
-                            'predicted_value': predicted_value,
-                            'gain': predicted_value - invested
-                        }
-                    except Exception:
-                        predictions[label] = None
-            except Exception:
-                predictions = {label: None for label in ["1 day", "2 days", "3 days"]}
-        else:
-            predictions = {label: None for label in ["1 day", "2 days", "3 days"]}
-        future_predictions.append({
-            'symbol': symbol,
-            'predictions': predictions
-        })
-        summary.append({
-            'symbol': symbol,
-            'shares': shares,
-            'cost': cost,
-            'current': current,
-            'invested': invested,
-            'current_value': current_value,
-            'gain': gain
-        })
-        total_invested += invested
-        total_current += current_value
-    overall_gain = total_current - total_invested
-    return render_template('portfolio.html', username=username, portfolio=portfolio, summary=summary, total_invested=total_invested, total_current=total_current, overall_gain=overall_gain, transactions=transactions, future_predictions=future_predictions, periods_map={"1 day": 1, "2 days": 2, "3 days": 3}, plotly_plots=plotly_plots)
-
-def predict_future_price(prices, periods):
-    from prophet import Prophet
-    import pandas as pd
-    import numpy as np
-    if not prices or len(prices) < 10:
-        raise ValueError("Not enough historical data to predict (need at least 10 days).")
-    df = pd.DataFrame({
-        'ds': pd.date_range(end=pd.Timestamp.today(), periods=len(prices)),
-        'y': prices
-    })
-    model = Prophet(daily_seasonality=False, yearly_seasonality=False, weekly_seasonality=False)
-    model.fit(df)
-    future = model.make_future_dataframe(periods=periods, freq='D')
-    forecast = model.predict(future)
-    predicted_price = forecast.iloc[-1]['yhat']
-    return predicted_price
+    with span("render"):
+        html = render_template('portfolio.html', username=username, portfolio=portfolio, fragments=fragments, model=model, plotlyjs_version=plotlyjs_version())
+    log_payload(f"portfolio page for {username}", len(html.encode()), len(portfolio))
+    response = app.make_response(html)
+    # Flashed messages are one-off, so only plain page views are identified by an ETag
+    if request.method == 'GET' and stamp is not None and '_flashes' not in session:
+        response.set_etag(page_etag(username, version, stamp, model))
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# --- Versioned page cache (fragments + ETag per portfolio version and quote snapshot) ---
+PAGE_TOKEN = f"{os.getpid()}-{time.time_ns()}"  # quote stamps are per process; templates may change on restart
+
+def page_etag(username, version, stamp, model):
+    return etag_for(PAGE_TOKEN, username, version, stamp, model)
+
+def check_not_modified(storage, username, model):
+    """304 response if the client's copy is current, checked without loading or rendering anything."""
+    if not request.if_none_match or '_flashes' in session:
+        return None
+    with span("storage"):
+        version = storage.portfolio_version(username)
+    symbols = fragment_cache.get(('symbols', username, version))
+    stamp = quote_cache.stamp(symbols) if symbols is not None else None
+    if stamp is None:
+        return None  # holdings not seen at this version, or a quote needs refreshing
+    etag = page_etag(username, version, stamp, model)
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def render_holdings(portfolio, prices):
+    with span("valuation"):
+        valuation = value_portfolio(portfolio, prices)
+    with span("render"):
+        return Markup(render_template('partials/holdings.html', summary=valuation.rows(), total_invested=valuation.total_invested, total_current=valuation.total_current, overall_gain=valuation.overall_gain))
+
+def render_transactions(storage, username):
+    # Only the newest page; the rest is fetched from portfolio_transactions on demand
+    with span("storage"):
+        page = storage.transactions_page(username)
+    with span("render"):
+        return Markup(render_template('partials/transactions.html', transactions=page['transactions'], next_cursor=page['next_cursor']))
+
+def render_charts(portfolio):
+    # Placeholders only: predictions and charts are filled in client-side from portfolio_forecasts
+    with span("render"):
+        return Markup(render_template('partials/charts.html', portfolio=portfolio, periods_map=DAYS_MAP))
+
+@app.route('/portfolio/<username>/risk')
+def portfolio_risk(username):
+    """Volatility, beta, correlation, VaR/CVaR and max drawdown over the last `days` days (JSON)."""
+    try:
+        days = max(30, min(int(request.args.get('days', RISK_WINDOW_DAYS)), 3650))
+    except ValueError:
+        return jsonify({'error': "days must be an integer"}), 400
+    with span("storage"):
+        portfolio = get_storage().get_portfolio(username)
+    with span("risk"):
+        report = risk_report(portfolio, days)
+    with span("serialize"):
+        return jsonify(report)
+
+MAX_TRANSACTIONS_PAGE = 500
+
+@app.route('/portfolio/<username>/transactions')
+def portfolio_transactions(username):
+    """One page of transactions, newest first; pass `next_cursor` back as `cursor` for the next page."""
+    try:
+        limit = max(1, min(int(request.args.get('limit', TRANSACTIONS_PAGE_SIZE)), MAX_TRANSACTIONS_PAGE))
+        with span("storage"):
+            page = get_storage().transactions_page(
+                username, limit,
+                cursor=request.args.get('cursor') or None,
+                symbol=request.args.get('symbol', '').strip().upper() or None,
+                action=request.args.get('action', '').strip().lower() or None)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    with span("serialize"):
+        return jsonify(page)
+
+@app.route('/portfolio/<username>/export/<dataset>.<fmt>')
+def portfolio_export(username, dataset, fmt):
+    """Holdings, transactions or valuations as CSV, JSONL or Parquet, streamed in chunks (see bulk_io.py)."""
+    try:
+        export = Export(dataset, fmt, username)
+    except (RuntimeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    response = Response(stream_with_context(iter(export)), mimetype=export.mimetype)
+    filename = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{username}-{dataset}.{fmt}")
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+# --- Live quotes (Server-Sent Events) ---
+STREAM_HEARTBEAT = 15  # seconds; also how quickly a closed connection is noticed
+
+@app.route('/portfolio/<username>/stream')
+def portfolio_stream(username):
+    """Price and P&L updates for the user's holdings as they change (shared poller, see live_quotes.py)."""
+    portfolio = get_storage().get_portfolio(username)
+    prices = fetch_current_prices([stock['symbol'] for stock in portfolio])
+
+    def events():
+        # Subscribed only once the client reads the stream; closing it unsubscribes
+        with get_hub().subscribe(prices) as subscription:
+            yield f"retry: {STREAM_HEARTBEAT * 1000}\n\n"
+            while True:
+                changed = subscription.get(timeout=STREAM_HEARTBEAT)
+                if not changed:
+                    yield ": keep-alive\n\n"
+                    continue
+                prices.update(changed)
+                yield f"data: {json.dumps(live_update(portfolio, prices, changed))}\n\n"
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let a proxy buffer the stream
+    return response
+
+def live_update(portfolio, prices, changed):
+    valuation = value_portfolio(portfolio, prices)
+    rows = [row for row in valuation.rows() if row['symbol'] in changed]
+    return {
+        'rows': [{k: row[k] for k in ('symbol', 'current', 'current_value', 'gain')} for row in rows],
+        'weights': {row['symbol']: row['weight'] for row in valuation.rows()},
+        'total_current': valuation.total_current,
+        'overall_gain': valuation.overall_gain,
+    }
+
+@app.route('/portfolio/<username>/forecasts')
+def portfolio_forecasts(username):
+    """Forecast job status; `results` fills in per symbol as each one finishes."""
+    with span("storage"):
+        portfolio = get_storage().get_portfolio(username)
+    job = start_forecast_job(username, portfolio, request.args.get('model'))
+    with span("serialize"):
+        response = jsonify(job.to_dict())
+    if job.status != "running":
+        charts = sum(1 for result in job.results.values() if result['figure'])
+        log_payload(f"forecasts for {username}", len(response.get_data()), charts)
+    return response
+
+# --- Static plotly.js (served once, cached by the browser) ---
+_plotlyjs = {}
+
+def plotlyjs_version():
+    if 'version' not in _plotlyjs:
+        from plotly.offline import get_plotlyjs_version
+        _plotlyjs['version'] = get_plotlyjs_version()
+    return _plotlyjs['version']
+
+def plotlyjs_bundle():
+    if 'bundle' not in _plotlyjs:
+        from plotly.offline import get_plotlyjs
+        _plotlyjs['bundle'] = get_plotlyjs().encode()
+    return _plotlyjs['bundle']
+
+@app.route('/assets/plotly-<version>.min.js')
+def plotlyjs(version):
+    if version != plotlyjs_version():
+        return redirect(url_for('plotlyjs', version=plotlyjs_version()))
+    response = Response(plotlyjs_bundle(), mimetype='application/javascript')
+    # The URL is versioned, so the bundle never changes under it
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(version)
+    return response.make_conditional(request)
+
+def log_payload(what, size, charts):
+    """Log a response size next to what embedding plotly.js in every chart used to cost."""
+    legacy = size + charts * len(plotlyjs_bundle()) if charts else size
+    app.logger.info("%s: %.1f KB (%d charts; ~%.1f KB with plotly.js embedded per chart)",
+                    what, size / 1024, charts, legacy / 1024)
+
+# --- Background forecasts ---
+DAYS_MAP = {"1 day": 1, "2 days": 2, "3 days": 3}
+
+def start_forecast_job(username, portfolio, model=None):
+    """Start (or attach to) the forecast job for this user's current holdings."""
+    # ?model=linear|ets|prophet overrides the configured backend for this request.
+    backend = model if model in FORECASTERS else None
+    holdings = tuple((stock['symbol'], stock['shares'], stock['cost_price']) for stock in portfolio)
+    return job_queue.submit((username, holdings, backend), build_forecasts, portfolio, backend, total=len(portfolio))
+
+def build_forecasts(job, portfolio, backend):
+    # Fetch more history, then forecast every symbol together (3-day forecast)
+    histories = fetch_historical_prices_many([stock['symbol'] for stock in portfolio], days=30)
+    holdings = {stock['symbol']: stock for stock in portfolio}
+    # The stage histogram times the fits ("forecast") and chart specs ("charts") of this job
+    forecasts = forecast_many(histories.items(), 3, backend)
+    started = time.perf_counter()
+    fitted = 0
+    for symbol, forecast in forecasts:
+        metrics.stage_seconds.observe(time.perf_counter() - started, "forecast")
+        fitted += 1
+        with span("charts"):
+            job.add_result(symbol, forecast_payload(holdings[symbol], histories[symbol], forecast))
+        started = time.perf_counter()
+    for symbol in holdings.keys() - job.results.keys():
+        job.add_result(symbol, forecast_payload(holdings[symbol], histories[symbol], None))
+    forecast_fits.inc(backend or FORECAST_BACKEND, amount=fitted)
+    fits_per_job.observe(fitted)
+
+def forecast_payload(stock, history, forecast):
+    """Predictions table entries and chart for one holding; "no prediction" when forecast is None."""
+    symbol = stock['symbol']
+    invested = stock['shares'] * stock['cost_price']
+    predictions = {label: None for label in DAYS_MAP}
+    figure = None
+    if forecast is not None:
+        try:
+            # Plotly plot: history + forecast, as a compact spec drawn client-side
+            figure = price_forecast_figure(symbol, history, forecast)
+            # For table predictions: 1 day, 2 days, 3 days
+            for label, days_ahead in DAYS_MAP.items():
+                try:
+                    predicted_price = forecast['yhat'][len(history)+days_ahead-1]
+                    predicted_value = stock['shares'] * predicted_price
+                    predictions[label] = {
+                        'predicted_price': predicted_price,
+                        'predicted_value': predicted_value,
+                        'gain': predicted_value - invested
+                    }
+                except Exception:
+                    predictions[label] = None
+        except Exception:
+            predictions = {label: None for label in DAYS_MAP}
+            figure = None
+    return {'predictions': predictions, 'figure': figure}
 
 if __name__ == '__main__':
     app.run(debug=True)